@@ -1,13 +1,24 @@
 import os
-import csv
-import hashlib
+import json
 import logging
+import tempfile
 from threading import Lock
-from flask import Flask, render_template, jsonify, send_file, request
+from flask import Flask, Response, render_template, jsonify, send_file, request, stream_with_context
 from werkzeug.utils import secure_filename
 from certificate_generator import CertificateGenerator
+from batch_generator import BatchGenerator
+from asset_cache import assets
 from pdf_uploader import PDFUploader
-from services.email import EmailService
+from upload_pipeline import UploadPipeline
+from generation_jobs import JobManager
+from metrics import StageMetrics, metrics, profiled
+from output_cache import BatchCache, output_cache
+from image_encoder import ENCODER_PRESETS
+from csv_reader import read_csv_rows
+from layout import require_columns, validate_fields
+from progress_store import ProgressStore, SourceFileCache, md5_file
+from services.email import EmailService, BulkEmailSender, DEFAULT_EMAIL_SUBJECT, render_email_template
+from services.email_validation import address_validator
 from schema import EmailSettingsSchema, SendTestEmailSchema
 import config
 
@@ -25,56 +36,78 @@ ALLOWED_TEMPLATE_EXTENSIONS = {"png", "jpg", "jpeg"}
 generation_lock = Lock()
 is_generating = False
 cancel_requested = False
+jobs = JobManager()
+
+
+progress = ProgressStore()
+email_status = ProgressStore(path=config.EMAIL_STATUS_CSV)
+source_files = SourceFileCache()
 
 
 def get_csv_hash(filepath):
-    with open(filepath, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+    return source_files.get(filepath, "md5", md5_file)
 
 
 def read_csv_data(filepath):
     with open(filepath, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        if config.NAME_COLUMN not in fieldnames:
-            raise ValueError(f"CSV must contain '{config.NAME_COLUMN}' column")
-        rows = [row for row in reader if row.get(config.NAME_COLUMN, "").strip()]
+        fieldnames, rows = read_csv_rows(f)
+        rows = list(rows)
     return rows, fieldnames
 
 
-def read_generated_csv():
-    """Read existing generated CSV and return processed names, results, and CSV hash"""
-    if not os.path.exists(config.GENERATED_CSV):
-        return set(), [], None
-
-    with open(config.GENERATED_CSV, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        results = []
-        for row in reader:
-            # Clean up any None keys that might exist from mismatched columns
-            cleaned_row = {k: v for k, v in row.items() if k is not None}
-            # Ensure error field exists
-            if "error" not in cleaned_row:
-                cleaned_row["error"] = ""
-            results.append(cleaned_row)
-
-        processed = {r[config.NAME_COLUMN] for r in results if config.NAME_COLUMN in r}
-        csv_hash = results[0].get("_csv_hash") if results else None
-    return processed, results, csv_hash
+def count_csv_rows(filepath):
+    """Number of named rows in a CSV, cached until the file changes"""
+    return source_files.get(filepath, "rows", lambda path: len(read_csv_data(path)[0]))
 
 
 def append_to_generated_csv(result, fieldnames, csv_hash):
     """Append a single result to generated CSV (creates file if doesn't exist)"""
-    file_exists = os.path.exists(config.GENERATED_CSV)
-    output_fields = ["_csv_hash"] + list(
-        dict.fromkeys(list(fieldnames) + ["url", "status", "error"])
-    )
+    progress.append(result, fieldnames, csv_hash)
+
 
-    with open(config.GENERATED_CSV, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=output_fields)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({**result, "_csv_hash": csv_hash})
+def create_uploader():
+    """Build the PDFUploader for the configured storage service"""
+    return PDFUploader.from_config()
+
+
+def create_email_sender(email_config, stage_metrics=None):
+    """Start a background sender for certificate emails, or None when email is off"""
+    if not email_config.get("is_email_enabled"):
+        return None
+    try:
+        # Unbounded queue: a slow SMTP server must never hold up rendering or uploads
+        return BulkEmailSender(
+            config=email_config, queue_size=0, status_store=email_status, logger=logger,
+            metrics=stage_metrics,
+        ).start()
+    except ValueError as e:
+        print(f"✗ Email disabled for this run: {e}")
+        return None
+
+
+def find_invalid_emails(rows, fieldnames, email_config):
+    """Report rows whose recipient address is invalid, when email is enabled"""
+    column = email_config["email_column_name"]
+    if not email_config.get("is_email_enabled") or column not in fieldnames:
+        return []
+    return address_validator.validate_column(rows, column)
+
+
+def queue_certificate_email(sender, email_config, row, url, csv_hash):
+    """Queue the certificate email for one row; returns False if it has no recipient"""
+    recipient_email = (row.get(email_config["email_column_name"]) or "").strip()
+    # Invalid addresses were reported by /generate before the run started
+    if not recipient_email or not address_validator.is_valid(recipient_email):
+        return False
+    name = row[config.NAME_COLUMN].strip()
+    fields = {**row, "name": name, "url": url}
+    sender.submit(
+        recipient_email,
+        render_email_template(email_config.get("email_subject") or DEFAULT_EMAIL_SUBJECT, fields),
+        render_email_template(email_config.get("email_template"), fields),
+        record={**fields, config.NAME_COLUMN: name, "_csv_hash": csv_hash},
+    )
+    return True
 
 
 @app.route("/")
@@ -103,7 +136,7 @@ def upload_csv():
             return jsonify({"success": False, "error": f"CSV must contain '{config.NAME_COLUMN}' column"}), 400
 
         csv_hash = get_csv_hash(filepath)
-        processed, _, existing_hash = read_generated_csv()
+        existing_hash = progress.csv_hash()
         is_new_csv = existing_hash and existing_hash != csv_hash
 
         return jsonify(
@@ -112,7 +145,7 @@ def upload_csv():
                 "message": f"CSV uploaded with {len(rows)} entries",
                 "total_entries": len(rows),
                 "is_new_csv": is_new_csv,
-                "previous_progress": len(processed) if is_new_csv else 0,
+                "previous_progress": progress.count() if is_new_csv else 0,
             }
         )
     except Exception as e:
@@ -122,9 +155,20 @@ def upload_csv():
 
 @app.route("/check-progress")
 def check_progress():
+    """Report progress status, optionally with a page of result rows
+
+    Query parameters:
+        summary: when true, return counts and status only (no results)
+        since / offset: index of the first result row to return (default 0)
+        limit: maximum number of result rows to return (default: all)
+
+    ``next_cursor`` in the response is the ``since`` value for the next delta request.
+    """
     global is_generating
-    processed, results, csv_hash = read_generated_csv()
-    has_progress = len(processed) > 0
+    current_job = jobs.current()
+    processed_count = progress.processed_count()
+    csv_hash = progress.csv_hash()
+    has_progress = processed_count > 0
 
     current_csv_path = os.path.join(config.UPLOAD_DIR, "current.csv")
     has_csv = os.path.exists(current_csv_path)
@@ -137,20 +181,37 @@ def check_progress():
 
         if csv_matches:
             try:
-                rows, _ = read_csv_data(current_csv_path)
-                is_complete = len(processed) == len(rows)
+                is_complete = processed_count == count_csv_rows(current_csv_path)
             except:
                 pass
 
+    response = {
+        "has_progress": has_progress,
+        "processed_count": processed_count,
+        "has_csv": has_csv,
+        "csv_matches": csv_matches,
+        "is_complete": is_complete,
+        "is_generating": is_generating,
+        "job_id": current_job.id if current_job else None,
+    }
+
+    if request.args.get("summary", "").lower() in ("1", "true"):
+        return jsonify(response)
+
+    total_results = progress.count()
+    offset = request.args.get("since", request.args.get("offset", 0, type=int), type=int)
+    offset = min(max(offset, 0), total_results)
+    limit = request.args.get("limit", type=int)
+    results = progress.since(offset, limit if limit and limit > 0 else None)
+
     return jsonify(
         {
-            "has_progress": has_progress,
-            "processed_count": len(processed),
+            **response,
             "results": results,
-            "has_csv": has_csv,
-            "csv_matches": csv_matches,
-            "is_complete": is_complete,
-            "is_generating": is_generating,
+            "offset": offset,
+            "total_results": total_results,
+            "next_cursor": offset + len(results),
+            "has_more": offset + len(results) < total_results,
         }
     )
 
@@ -158,8 +219,8 @@ def check_progress():
 @app.route("/reset-progress", methods=["POST"])
 def reset_progress():
     try:
-        if os.path.exists(config.GENERATED_CSV):
-            os.remove(config.GENERATED_CSV)
+        progress.reset()
+        email_status.reset()
         return jsonify({"success": True, "message": "Progress reset"})
     except Exception as e:
         logger.exception("Error resetting progress")
@@ -175,6 +236,7 @@ def cancel_generation():
 
 @app.route("/generate", methods=["POST"])
 def generate_certificates():
+    """Validate the uploaded CSV and start generation as a background job"""
     global is_generating, cancel_requested
 
     if not generation_lock.acquire(blocking=False):
@@ -184,84 +246,309 @@ def generate_certificates():
         }), 409
 
     try:
-        is_generating = True
-        cancel_requested = False
         csv_path = os.path.join(config.UPLOAD_DIR, "current.csv")
         if not os.path.exists(csv_path):
+            generation_lock.release()
             return jsonify({"success": False, "error": "No CSV uploaded"}), 400
 
         rows, fieldnames = read_csv_data(csv_path)
+        try:
+            require_columns(config.load_settings(), fieldnames)
+        except ValueError as e:
+            generation_lock.release()
+            return jsonify({"success": False, "error": str(e)}), 400
+
         csv_hash = get_csv_hash(csv_path)
-        processed_names, all_results, existing_hash = read_generated_csv()
+        processed_names = progress.processed_names()
+        existing_hash = progress.csv_hash()
 
         if existing_hash and existing_hash != csv_hash:
+            generation_lock.release()
             return (
                 jsonify({"success": False, "error": "CSV changed, reset progress"}),
                 400,
             )
 
-        generator = CertificateGenerator()
-        uploader = (
-            PDFUploader(
-                service=config.UPLOAD_SERVICE,
-                cloudinary_config=config.get_cloudinary_config(),
-                cloudinary_folder=config.CLOUDINARY_FOLDER,
-            )
-            if config.UPLOAD_SERVICE == "cloudinary"
-            else PDFUploader(service=config.UPLOAD_SERVICE)
+        # Skip names already in the progress file and duplicate names within the CSV
+        pending_rows = []
+        queued_names = set(processed_names)
+        for row in rows:
+            name = row[config.NAME_COLUMN].strip()
+            if name not in queued_names:
+                queued_names.add(name)
+                pending_rows.append(row)
+
+        # Checked up front so bad addresses are reported before anything is generated
+        invalid_emails = find_invalid_emails(pending_rows, fieldnames, config.load_email_config())
+
+        previous_count = progress.count()
+        target = lambda job: run_generation(
+            job, rows, pending_rows, fieldnames, csv_hash, processed_names, previous_count
         )
+        data = request.get_json(silent=True) or {}
+        if data.get("profile") or config.PROFILE_GENERATION:
+            target = profile_generation(target)
 
-        new_results = []
-        cancelled = False
+        is_generating = True
+        cancel_requested = False
+        job = jobs.start(target, total=len(pending_rows))
+    except Exception as e:
+        is_generating = False
+        generation_lock.release()
+        logger.exception("Error starting certificate generation")
+        return jsonify({"success": False, "error": "An internal error occurred while generating certificates"}), 500
 
-        for row in rows:
-            if cancel_requested:
-                cancelled = True
-                print("⚠️  Generation cancelled by user")
-                break
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "total": len(pending_rows),
+        "invalid_emails": invalid_emails,
+    }), 202
 
-            name = row[config.NAME_COLUMN].strip()
-            if name in processed_names:
-                continue
 
-            try:
-                pdf_path = generator.generate_certificate(name)
-                url = uploader.upload(pdf_path, name)
-                result = {**row, "url": url, "status": "success"}
-                print(f"✓ {name} -> {url}")
-            except Exception as e:
-                logger.exception("Error generating certificate for %s", name)
-                result = {**row, "url": "", "status": "error", "error": "Certificate generation failed"}
-                print(f"✗ {name}: {e}")
+@app.route("/validate-emails", methods=["POST"])
+def validate_emails():
+    """Check the email column of the uploaded CSV and list invalid rows"""
+    try:
+        csv_path = os.path.join(config.UPLOAD_DIR, "current.csv")
+        if not os.path.exists(csv_path):
+            return jsonify({"success": False, "error": "No CSV uploaded"}), 400
 
-            try:
-                append_to_generated_csv(result, fieldnames, csv_hash)
-                all_results.append(result)
-                new_results.append(result)
-                processed_names.add(name)
-            except Exception as e:
-                print(f"✗ Failed to save progress for {name}: {e}")
-                pass
+        data = request.get_json(silent=True) or {}
+        column = data.get("column") or config.load_email_config()["email_column_name"]
+        rows, fieldnames = read_csv_data(csv_path)
+        if column not in fieldnames:
+            return jsonify({"success": False, "error": f"CSV has no '{column}' column"}), 400
 
-        return jsonify(
-            {
-                "success": True,
-                "message": f"Generated {len(new_results)} certificates" + (" (cancelled)" if cancelled else ""),
-                "results": all_results,
-                "new_results": new_results,
+        invalid = address_validator.validate_column(
+            rows, column, check_deliverability=data.get("check_deliverability")
+        )
+        return jsonify({
+            "success": True,
+            "column": column,
+            "checked": len(rows),
+            "invalid_count": len(invalid),
+            "invalid": invalid,
+        })
+    except Exception as e:
+        logger.exception("Error validating email addresses")
+        return jsonify({"success": False, "error": "An internal error occurred while validating emails"}), 500
+
+
+def profile_generation(target):
+    """Wrap a job target so the run is profiled into PROFILE_DIR"""
+    def run(job):
+        path = os.path.join(config.PROFILE_DIR, f"generation-{job.id}.{config.PROFILE_FORMAT}")
+        with profiled(path) as written:
+            target(job)
+        print(f"✓ Profile written to {written}")
+    return run
+
+
+def run_generation(job, rows, pending_rows, fieldnames, csv_hash, processed_names, previous_count):
+    """Render, upload and record each pending row; runs on the job's background thread"""
+    global is_generating, cancel_requested
+
+    job_metrics = StageMetrics(parent=metrics)
+    try:
+        settings = config.load_settings()
+        batch_cache = None
+        uploader = create_uploader()
+        email_sender = None
+        try:
+            if config.OUTPUT_CACHE_ENABLED:
+                # Certificates identical to an earlier render reuse its PDF and URL
+                batch_cache = BatchCache(output_cache, settings, config.UPLOAD_SERVICE)
+                uploader = batch_cache.cached_uploader(uploader)
+            batch = BatchGenerator(settings=settings, metrics=job_metrics, cache=batch_cache)
+            email_config = config.load_email_config()
+            email_sender = create_email_sender(email_config, job_metrics)
+            new_count = 0
+            handled = 0
+            emails_queued = 0
+
+            names = [row[config.NAME_COLUMN].strip() for row in pending_rows]
+            renders = batch.render(pending_rows, should_stop=lambda: cancel_requested)
+            pipeline = UploadPipeline(uploader, metrics=job_metrics)
+            uploads = pipeline.run(
+                (index, names[index], pdf, error) for index, pdf, error in renders
+            )
+
+            for index, url, error in uploads:
+                handled += 1
+                row = pending_rows[index]
+                name = names[index]
+
+                if error is None:
+                    result = {**row, "url": url, "status": "success"}
+                    print(f"✓ {name} -> {url}")
+                    if email_sender and queue_certificate_email(email_sender, email_config, row, url, csv_hash):
+                        emails_queued += 1
+                else:
+                    logger.error("Error generating certificate for %s", name, exc_info=error)
+                    result = {**row, "url": "", "status": "error", "error": "Certificate generation failed"}
+                    print(f"✗ {name}: {error}")
+                job_metrics.increment(f"certificates_{result['status']}")
+
+                try:
+                    with job_metrics.timer("progress_write"):
+                        append_to_generated_csv(result, fieldnames, csv_hash)
+                    job.add_result(result)
+                    new_count += 1
+                    processed_names.add(name)
+                except Exception as e:
+                    print(f"✗ Failed to save progress for {name}: {e}")
+                    pass
+        finally:
+            # Also on failure, so upload sessions and email workers never outlive the job
+            uploader.close()
+            if email_sender:
+                # Uploads are done; wait for the queued emails to go out
+                email_sender.close()
+
+        cancelled = handled < len(pending_rows)
+        if cancelled:
+            print("⚠️  Generation cancelled by user")
+
+        email_summary = {}
+        if email_sender:
+            email_summary = {
+                "emails_queued": emails_queued,
+                "emails_sent": email_sender.sent,
+                "emails_failed": email_sender.failed,
+            }
+            print(f"✓ Emails sent: {email_sender.sent}, failed: {email_sender.failed}")
+
+        job.finish(
+            "cancelled" if cancelled else "completed",
+            summary={
+                "message": f"Generated {new_count} certificates" + (" (cancelled)" if cancelled else ""),
+                "new_count": new_count,
+                "total_count": previous_count + new_count,
                 "completed": len(processed_names) == len(rows),
                 "cancelled": cancelled,
-            }
+                **email_summary,
+                "cache": batch_cache.stats() if batch_cache else {},
+                "timings": job_metrics.summary(),
+            },
         )
     except Exception as e:
         logger.exception("Error generating certificates")
-        return jsonify({"success": False, "error": "An internal error occurred while generating certificates"}), 500
+        job.finish("failed", error="An internal error occurred while generating certificates")
     finally:
         is_generating = False
         cancel_requested = False
         generation_lock.release()
 
 
+@app.route("/metrics")
+def get_metrics():
+    """Stage timing histograms for every run since startup (Prometheus text format)"""
+    return Response(metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    """Summary of a generation job (counts and status only)"""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **job.to_dict()})
+
+
+@app.route("/jobs/<job_id>/events")
+def stream_job_events(job_id):
+    """Stream a job's per-row results as Server-Sent Events
+
+    Each row is sent once as a ``result`` event whose id is its position in
+    the job, so a reconnecting EventSource resumes via Last-Event-ID (or an
+    explicit ``offset`` query parameter). A final ``done`` event carries the
+    job summary.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    last_event_id = request.headers.get("Last-Event-ID")
+    try:
+        offset = int(last_event_id) + 1 if last_event_id else request.args.get("offset", 0, type=int)
+    except ValueError:
+        # Not an id we sent; replay the job from the start
+        offset = 0
+    offset = max(offset, 0)
+
+    def events():
+        position = offset
+        while True:
+            new_results, done = job.wait_for_results(position, timeout=15)
+            for result in new_results:
+                yield f"id: {position}\nevent: result\ndata: {json.dumps(result)}\n\n"
+                position += 1
+            if done and not new_results:
+                yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            if not new_results:
+                # Keep idle connections open through proxies
+                yield ": keep-alive\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_and_remove(path, chunk_size=64 * 1024):
+    """Send a file in chunks and delete it once sent (or once the client goes away)"""
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+@app.route("/export-pdf")
+def export_pdf():
+    """Render every row of the current CSV into one multi-page PDF for printing"""
+    csv_path = os.path.join(config.UPLOAD_DIR, "current.csv")
+    if not os.path.exists(csv_path):
+        return jsonify({"success": False, "error": "No CSV uploaded"}), 400
+
+    # A file of its own per request, so concurrent exports never send each other's half-written PDF
+    fd, pdf_path = tempfile.mkstemp(prefix=".export-", suffix=".pdf", dir=config.OUTPUT_DIR)
+    os.close(fd)
+    pages = None
+    try:
+        generator = CertificateGenerator()
+        with open(csv_path, "r", encoding="utf-8") as f:
+            fieldnames, rows = read_csv_rows(f)
+            require_columns(generator.settings, fieldnames)
+            pages = generator.generate_merged_pdf(rows, pdf_path)
+    except ValueError as e:
+        logger.warning("CSV validation error: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 400
+    except FileNotFoundError:
+        logger.exception("Template not found while exporting PDF")
+        return jsonify({"success": False, "error": "Certificate template not found"}), 404
+    except Exception:
+        logger.exception("Error exporting merged PDF")
+        return jsonify({"success": False, "error": "An internal error occurred while exporting the PDF"}), 500
+    finally:
+        if pages is None:
+            os.remove(pdf_path)
+
+    logger.info("Exported %d certificates", pages)
+    return Response(
+        _stream_and_remove(pdf_path),
+        mimetype="application/pdf",
+        headers={
+            "Content-Disposition": "attachment; filename=certificates.pdf",
+            "Content-Length": str(os.path.getsize(pdf_path)),
+        },
+    )
+
+
 @app.route("/download-csv")
 def download_csv():
     if not os.path.exists(config.GENERATED_CSV):
@@ -358,6 +645,16 @@ def save_settings():
         if not os.path.exists(updated_settings["font_path"]):
             return jsonify({"success": False, "error": f"Font not found: {updated_settings['font_path']}"}), 400
 
+        if updated_settings["output_mode"] not in config.OUTPUT_MODES:
+            return jsonify({"success": False, "error": f"Invalid output mode. Allowed: {', '.join(config.OUTPUT_MODES)}"}), 400
+
+        if updated_settings["encoder_preset"] not in ENCODER_PRESETS:
+            return jsonify({"success": False, "error": f"Invalid encoder preset. Allowed: {', '.join(ENCODER_PRESETS)}"}), 400
+
+        fields_error = validate_fields(updated_settings["fields"])
+        if fields_error:
+            return jsonify({"success": False, "error": f"Invalid layout: {fields_error}"}), 400
+
         config.save_settings(updated_settings)
         return jsonify({"success": True, "settings": updated_settings})
     except Exception as e:
@@ -414,6 +711,7 @@ def upload_template():
         os.makedirs(config.TEMPLATES_DIR, exist_ok=True)
         filepath = os.path.join(config.TEMPLATES_DIR, filename)
         file.save(filepath)
+        assets.invalidate(filepath)
 
         return jsonify({
             "success": True,
@@ -444,6 +742,7 @@ def upload_font():
         os.makedirs(config.FONTS_DIR, exist_ok=True)
         filepath = os.path.join(config.FONTS_DIR, filename)
         file.save(filepath)
+        assets.invalidate(filepath)
 
         return jsonify({
             "success": True,
@@ -462,6 +761,10 @@ def generate_preview():
     try:
         data = request.get_json() or {}
         name = data.pop("name", "Sample Name")
+        if "fields" in data:
+            fields_error = validate_fields(data["fields"])
+            if fields_error:
+                return jsonify({"success": False, "error": f"Invalid layout: {fields_error}"}), 400
 
         # Merge with current settings
         current_settings = config.load_settings()
@@ -479,6 +782,48 @@ def generate_preview():
         return jsonify({"success": False, "error": "An internal error occurred while generating the preview"}), 500
 
 
+@app.route("/api/preview/image", methods=["GET", "POST"])
+def preview_image():
+    """Preview as raw image bytes with an ETag
+
+    GET takes ``name`` and a JSON-encoded ``settings`` query parameter, POST
+    takes the same JSON body as /api/preview. Identical settings + name are
+    served from the server-side preview cache, and a matching If-None-Match
+    gets a 304 without a body.
+    """
+    try:
+        if request.method == "GET":
+            data = json.loads(request.args.get("settings") or "{}")
+            name = request.args.get("name", "Sample Name")
+        else:
+            data = request.get_json() or {}
+            name = data.pop("name", "Sample Name") if isinstance(data, dict) else None
+
+        if not isinstance(data, dict):
+            return jsonify({"success": False, "error": "Invalid preview settings"}), 400
+        if "fields" in data:
+            fields_error = validate_fields(data["fields"])
+            if fields_error:
+                return jsonify({"success": False, "error": f"Invalid layout: {fields_error}"}), 400
+
+        preview_settings = {**config.load_settings(), **data}
+        preview = CertificateGenerator(settings=preview_settings).render_preview(name=name)
+
+        response = Response(preview.data, mimetype=preview.mime_type)
+        response.set_etag(preview.etag)
+        # Always revalidate: the same URL changes when saved settings or assets change
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": "Invalid preview settings"}), 400
+    except FileNotFoundError as e:
+        logger.exception("File not found while generating preview")
+        return jsonify({"success": False, "error": "Required file not found for preview generation"}), 404
+    except Exception as e:
+        logger.exception("Error generating preview")
+        return jsonify({"success": False, "error": "An internal error occurred while generating the preview"}), 500
+
+
 if __name__ == "__main__":
     try:
         config.validate_setup()
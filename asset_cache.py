@@ -0,0 +1,141 @@
+"""Process-wide cache for decoded certificate templates and loaded fonts"""
+
+import os
+import hashlib
+from PIL import Image, ImageFont
+from lru_cache import LRUCache
+from image_encoder import encode_image
+import config
+
+_JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+
+def convert_to_rgb(img):
+    """Convert image to RGB mode for JPEG compatibility"""
+    if img.mode in ("RGBA", "LA", "P"):
+        # Create a white background for transparent images
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        if img.mode == "P":
+            img = img.convert("RGBA")
+        background.paste(img, mask=img.split()[-1] if img.mode in ("RGBA", "LA") else None)
+        return background
+    elif img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def file_signature(path):
+    """Identify a file revision by absolute path, modification time and size
+
+    Returns None when there is no file at ``path``.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _asset_key(path, *extra):
+    signature = file_signature(path)
+    if signature is None:
+        raise FileNotFoundError(path)
+    return (*signature, *extra)
+
+
+class AssetCache:
+    """Cache decoded RGB templates and parsed fonts keyed by file revision
+
+    Templates are keyed by path + mtime, fonts by path + mtime + point size, so
+    a file that is overwritten on disk is picked up on the next lookup. Cached
+    template images are shared: callers must ``copy()`` before drawing on them.
+    """
+
+    def __init__(self, max_templates=4, max_fonts=32):
+        self._templates = LRUCache(max_templates)
+        self._encoded = LRUCache(max_templates)
+        self._scaled = LRUCache(max_templates)
+        self._fonts = LRUCache(max_fonts)
+
+    def get_template(self, path):
+        """Return the decoded RGB base image for a template file"""
+        key = _asset_key(path)
+        img = self._templates.get(key)
+        if img is None:
+            with Image.open(path) as src:
+                src.load()
+                img = convert_to_rgb(src)
+            self._templates.put(key, img)
+        return img
+
+    def get_template_encoded(self, path, preset, quality):
+        """Return ``(bytes, format, digest)`` for a template used as a PDF background
+
+        A JPEG template is embedded as the file's own bytes, so it is neither
+        re-encoded nor degraded; any other template is encoded once per
+        encoder preset and quality.
+        """
+        key = _asset_key(path, preset, quality)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            with open(path, "rb") as f:
+                data = f.read()
+            if data.startswith(_JPEG_SIGNATURE):
+                image_format = "JPEG"
+            else:
+                data, image_format = encode_image(self.get_template(path), preset, quality)
+            encoded = (data, image_format, hashlib.md5(data).hexdigest())
+            self._encoded.put(key, encoded)
+        return encoded
+
+    def get_template_scaled(self, path, max_width):
+        """Return ``(image, scale)``: the template downscaled once to at most ``max_width``"""
+        key = _asset_key(path, max_width)
+        scaled = self._scaled.get(key)
+        if scaled is None:
+            img = self.get_template(path)
+            width, height = img.size
+            if width > max_width:
+                scale = max_width / width
+                img = img.resize((max_width, int(height * scale)), Image.Resampling.LANCZOS)
+            else:
+                scale = 1.0
+            scaled = (img, scale)
+            self._scaled.put(key, scaled)
+        return scaled
+
+    def get_font(self, path, size):
+        """Return a FreeType font for the given file and point size"""
+        key = _asset_key(path, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(path, size)
+            self._fonts.put(key, font)
+        return font
+
+    def get_default_font(self):
+        font = self._fonts.get("<default>")
+        if font is None:
+            font = ImageFont.load_default()
+            self._fonts.put("<default>", font)
+        return font
+
+    def invalidate(self, path=None):
+        """Forget cached assets for one file, or everything when path is None"""
+        if path is None:
+            self._templates.clear()
+            self._encoded.clear()
+            self._scaled.clear()
+            self._fonts.clear()
+            return
+        abs_path = os.path.abspath(path)
+        self._templates.discard_if(lambda key: key[0] == abs_path)
+        self._encoded.discard_if(lambda key: key[0] == abs_path)
+        self._scaled.discard_if(lambda key: key[0] == abs_path)
+        self._fonts.discard_if(lambda key: key[0] == abs_path)
+
+
+# Shared by every CertificateGenerator in this process
+assets = AssetCache(
+    max_templates=config.ASSET_CACHE_MAX_TEMPLATES,
+    max_fonts=config.ASSET_CACHE_MAX_FONTS,
+)
@@ -0,0 +1,188 @@
+"""Parallel batch rendering on top of CertificateGenerator"""
+
+import os
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from certificate_generator import CertificateGenerator, certificate_filename, write_pdf
+from layout import split_row
+import config
+
+# Generator owned by each pool worker process (set up by _init_worker)
+_worker_generator = None
+
+
+def _init_worker(settings, output_dir):
+    """Build the worker's generator and load its template/font before any job arrives"""
+    global _worker_generator
+    # Spawned workers re-import config, so carry over an output dir changed at runtime
+    config.OUTPUT_DIR = output_dir
+    _worker_generator = CertificateGenerator(settings=settings)
+    _worker_generator.warm_up()
+
+
+def _render(generator, name, row, in_memory):
+    if in_memory:
+        return generator.generate_certificate_bytes(name, row=row)
+    return generator.generate_certificate(name, row=row)
+
+
+def _render_in_worker(name, row=None, in_memory=False):
+    """Render one certificate and send its stage timings back with the path (or PDF bytes)"""
+    pdf = _render(_worker_generator, name, row, in_memory)
+    return pdf, _worker_generator.timings
+
+
+class PDFWriter:
+    """Save in-memory renders to output/ on a background thread
+
+    Each file is recorded in the output cache only once it is completely
+    written, so the cache never points at a PDF that is still being saved.
+    """
+
+    def __init__(self, output_dir=None, metrics=None, cache=None):
+        self.output_dir = output_dir or config.OUTPUT_DIR
+        self.metrics = metrics
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-writer")
+
+    def save(self, name, data, row=None):
+        self._pool.submit(self._write, name, data, row)
+
+    def _write(self, name, data, row):
+        start = time.perf_counter()
+        try:
+            pdf_path = write_pdf(os.path.join(self.output_dir, certificate_filename(name)), data)
+        except OSError as e:
+            print(f"✗ Failed to save {name}'s PDF: {e}")
+            return
+        if self.metrics is not None:
+            self.metrics.observe("save", time.perf_counter() - start)
+        if self.cache is not None:
+            self.cache.record_pdf(name, pdf_path, row)
+
+    def close(self):
+        """Wait for every queued PDF to be written"""
+        self._pool.shutdown(wait=True)
+
+
+class BatchGenerator:
+    """Render many certificates across a process pool, yielding results in input order"""
+
+    def __init__(self, settings=None, workers=None, metrics=None, cache=None, in_memory=None, save_pdfs=None):
+        """``metrics`` (a StageMetrics) receives each certificate's stage timings;
+        ``cache`` (a BatchCache) lets unchanged certificates skip rendering.
+
+        With ``in_memory`` each result is the PDF bytes instead of a path in
+        output/; ``save_pdfs`` then still writes the files, off the render path.
+        """
+        self.settings = settings or config.load_settings()
+        self.workers = max(1, workers or config.RENDER_WORKERS)
+        self.metrics = metrics
+        self.cache = cache
+        self.in_memory = config.RENDER_TO_MEMORY if in_memory is None else in_memory
+        self.save_pdfs = config.SAVE_LOCAL_PDFS if save_pdfs is None else save_pdfs
+        self._writer = None
+
+    def _cached(self, name, row):
+        if self.cache is None:
+            return False, None
+        return self.cache.reusable(name, row)
+
+    def _rendered(self, name, row, pdf, timings):
+        self._record(timings)
+        if not self.in_memory:
+            if self.cache is not None:
+                self.cache.record_pdf(name, pdf, row)
+        elif self._writer is not None:
+            self._writer.save(name, pdf, row)
+
+    def _record(self, timings):
+        if self.metrics is not None:
+            self.metrics.observe_all(timings)
+
+    def render(self, names, should_stop=None):
+        """Render each name and yield ``(index, pdf, error)`` in the order given
+
+        ``names`` may also be CSV row dicts, for layouts that print other
+        columns besides the name. ``pdf`` is the PDF's path, or its bytes in
+        in-memory mode (a cached certificate may still come back as a path).
+        ``should_stop`` is polled before every new submission; once it returns
+        True no more work is queued, pending renders are cancelled and the
+        iteration ends after the last result that was already yielded.
+        """
+        should_stop = should_stop or (lambda: False)
+        if self.in_memory and self.save_pdfs:
+            self._writer = PDFWriter(metrics=self.metrics, cache=self.cache)
+        try:
+            if self.workers == 1:
+                yield from self._render_serial(names, should_stop)
+            else:
+                yield from self._render_parallel(names, should_stop)
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def _render_serial(self, names, should_stop):
+        generator = CertificateGenerator(settings=self.settings)
+        for index, item in enumerate(names):
+            if should_stop():
+                return
+            name, row = split_row(item)
+            skip, pdf_path = self._cached(name, row)
+            if skip:
+                yield index, pdf_path, None
+                continue
+            try:
+                pdf = _render(generator, name, row, self.in_memory)
+            except Exception as e:
+                yield index, None, e
+                continue
+            self._rendered(name, row, pdf, generator.timings)
+            yield index, pdf, None
+
+    def _render_parallel(self, names, should_stop):
+        # Keep a bounded window in flight so a huge CSV doesn't queue every row at once
+        window = self.workers * 2
+        pending = deque()
+        names = iter(enumerate(names))
+
+        # Spawn rather than fork: the pool is started from a thread while other
+        # threads (Flask, uploads) may hold cache locks a forked child would inherit
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.settings, config.OUTPUT_DIR),
+        ) as pool:
+            try:
+                while True:
+                    while len(pending) < window and not should_stop():
+                        item = next(names, None)
+                        if item is None:
+                            break
+                        index, name, row = item[0], *split_row(item[1])
+                        skip, pdf_path = self._cached(name, row)
+                        future = None if skip else pool.submit(_render_in_worker, name, row, self.in_memory)
+                        pending.append((index, name, row, future, pdf_path))
+
+                    if not pending or should_stop():
+                        return
+
+                    index, name, row, future, pdf_path = pending.popleft()
+                    if future is None:
+                        yield index, pdf_path, None
+                        continue
+                    try:
+                        pdf, timings = future.result()
+                    except Exception as e:
+                        yield index, None, e
+                        continue
+                    self._rendered(name, row, pdf, timings)
+                    yield index, pdf, None
+            finally:
+                for _, _, _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
@@ -0,0 +1,82 @@
+"""Messages/sec for building personalized certificate emails
+
+Run from the repository root:
+
+    python -m benchmarks.bench_email_templates --messages 100000
+"""
+
+import time
+import argparse
+from services.email import (
+    MessagePrototype, build_message, compile_email_template, render_email_template
+)
+
+SMTP_CONFIG = {"smtp_from_name": "Certificate Generator", "smtp_from_email": "certs@example.com"}
+SUBJECT = "Your {department} certificate, {name}"
+TEMPLATE = (
+    "Hello {name},\n\n"
+    "Congratulations on completing the {department} track.\n"
+    "Your certificate is ready: {url}\n\n"
+    "Thanks,\nThe Certificate Generator team\n"
+)
+
+
+def make_rows(count):
+    return [
+        {
+            "name": f"Participant {i}",
+            "email": f"participant{i}@example.com",
+            "department": ("Engineering", "Marketing", "Design")[i % 3],
+            "url": f"https://files.example.com/{i:08d}.pdf",
+        }
+        for i in range(count)
+    ]
+
+
+def build_baseline(rows):
+    """Format the raw template string and flatten a fresh MIME tree per message"""
+    for row in rows:
+        subject = SUBJECT.format_map(row)
+        body = TEMPLATE.format_map(row)
+        build_message(SMTP_CONFIG, subject, body, row["email"]).as_string()
+
+
+def build_compiled(rows):
+    """Compiled templates rendered into a prebuilt MIME skeleton"""
+    prototype = MessagePrototype(SMTP_CONFIG)
+    subject_template = compile_email_template(SUBJECT)
+    body_template = compile_email_template(TEMPLATE)
+    for row in rows:
+        prototype.render(row["email"], subject_template.render(row), body_template.render(row))
+
+
+def build_cached_lookup(rows):
+    """render_email_template as called per row by the generation pipeline"""
+    prototype = MessagePrototype(SMTP_CONFIG)
+    for row in rows:
+        prototype.render(row["email"], render_email_template(SUBJECT, row), render_email_template(TEMPLATE, row))
+
+
+def run(name, build, rows):
+    start = time.perf_counter()
+    build(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(rows) / elapsed:>12,.0f} msg/s  ({elapsed:.2f}s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.messages)
+    print(f"Building {args.messages:,} personalized messages")
+    baseline = run("format + MIMEMultipart", build_baseline, rows)
+    compiled = run("compiled + prototype", build_compiled, rows)
+    run("render_email_template", build_cached_lookup, rows)
+    print(f"Speedup: {baseline / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
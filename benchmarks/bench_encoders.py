@@ -0,0 +1,94 @@
+"""Speed/size tradeoff of each image encoder preset
+
+Encodes a rendered certificate with every preset in image_encoder, single
+threaded and from a thread pool (Pillow releases the GIL while encoding, so
+threaded throughput should scale with cores). Run from the repository root:
+
+    python -m benchmarks.bench_encoders
+    python -m benchmarks.bench_encoders --width 3300   # a 300 DPI print template
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from certificate_generator import CertificateGenerator
+from image_encoder import ENCODER_PRESETS, encode_image
+import config
+
+
+def render_sample(width=None):
+    """A certificate image as the raster path would encode it"""
+    generator = CertificateGenerator(settings={**config.DEFAULT_VISUAL_SETTINGS})
+    plan = generator._get_plan(generator._get_template_path())
+    img = plan.render({config.NAME_COLUMN: "Alexandra Montgomery-Smith"})
+    if width and width != img.width:
+        img = img.resize((width, round(img.height * width / img.width)), Image.Resampling.LANCZOS)
+    return img
+
+
+def bench_preset(img, preset, repeat, threads):
+    quality = config.DEFAULT_VISUAL_SETTINGS["image_quality"]
+    # Pillow keeps per-save options on the image object, so never save one image
+    # from several threads (certificate renders always encode private copies)
+    img = img.copy()
+    local = threading.local()
+
+    def encode_in_thread(_):
+        if not hasattr(local, "img"):
+            local.img = img.copy()
+        return encode_image(local.img, preset, quality)
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data, image_format = encode_image(img, preset, quality)
+        samples.append(time.perf_counter() - start)
+
+    count = repeat * threads
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(encode_in_thread, range(count)))
+        threaded = time.perf_counter() - start
+
+    return {
+        "preset": preset,
+        "format": image_format,
+        "ms": round(statistics.median(samples) * 1000, 2),
+        "kb": round(len(data) / 1024, 1),
+        "per_sec_1_thread": round(1 / statistics.median(samples), 1),
+        f"per_sec_{threads}_threads": round(count / threaded, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, help="resize the template to this many pixels wide first")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    img = render_sample(args.width)
+    print(f"Encoding a {img.width}x{img.height} certificate ({args.threads} threads for the parallel run)")
+    results = []
+    for preset in ENCODER_PRESETS:
+        result = bench_preset(img, preset, args.repeat, args.threads)
+        results.append(result)
+        print(
+            f"  {preset:<9} {result['format']:<5} {result['ms']:>8} ms {result['kb']:>9} KB  "
+            f"{result['per_sec_1_thread']:>7}/s  {result[f'per_sec_{args.threads}_threads']:>7}/s threaded"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"width": img.width, "height": img.height, "results": results}, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
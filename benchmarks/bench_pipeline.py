@@ -0,0 +1,179 @@
+"""Per-stage and end-to-end timings for certificate generation
+
+Times each stage of CertificateGenerator.generate_certificate on the bundled
+template with every font in static/fonts, then measures end-to-end
+certificates/sec and peak RSS with 1, half and all cores. Run from the
+repository root:
+
+    python -m benchmarks.bench_pipeline --json bench.json
+
+Compare two JSON files to spot regressions; stage timings are the median
+of ``--repeat`` runs in milliseconds.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+from PIL import Image, ImageFont
+from reportlab.pdfgen import canvas
+from asset_cache import convert_to_rgb
+from pdf_writer import draw_jpeg
+from text_layer import render_text_tile
+import config
+
+TEMPLATE = os.path.join(config.TEMPLATES_DIR, "certificate.png")
+SAMPLE_NAME = "Alexandra Montgomery-Smith"
+
+
+def time_stage(func, repeat):
+    """Median wall time of ``func()`` in milliseconds, plus its last return value"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3), result
+
+
+def load_template():
+    with Image.open(TEMPLATE) as src:
+        src.load()
+        return src.copy()
+
+
+def bench_stages(font_path, repeat):
+    """Time every stage of one raster certificate, uncached, for one font"""
+    settings = config.DEFAULT_VISUAL_SETTINGS
+    stages = {}
+
+    stages["template_load"], raw = time_stage(load_template, repeat)
+    stages["convert_to_rgb"], base = time_stage(lambda: convert_to_rgb(raw.copy()), repeat)
+    stages["font_load"], font = time_stage(
+        lambda: ImageFont.truetype(font_path, settings["font_size"]), repeat
+    )
+
+    def measure_and_draw():
+        img = base.copy()
+        tile = render_text_tile(SAMPLE_NAME, font, settings["stroke_width"])
+        x = int(img.width * settings["text_x_position"]) - tile.text_width // 2
+        y = int(img.height * settings["text_y_position"]) - tile.text_height // 2
+        img.paste(tuple(settings["text_color"]), (x + tile.ink_offset[0], y + tile.ink_offset[1]), tile.mask)
+        return img
+
+    stages["text_draw"], img = time_stage(measure_and_draw, repeat)
+
+    def encode():
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=settings["image_quality"])
+        return buffer.getvalue()
+
+    stages["jpeg_encode"], jpeg_bytes = time_stage(encode, repeat)
+
+    def write_pdf():
+        out = io.BytesIO()
+        width = 11 * 72
+        height = width / (img.width / img.height)
+        c = canvas.Canvas(out, pagesize=(width, height))
+        draw_jpeg(c, jpeg_bytes, "Page1", 0, 0, width, height)
+        c.save()
+        return out.getvalue()
+
+    stages["pdf_write"], pdf_bytes = time_stage(write_pdf, repeat)
+    stages["total"] = round(sum(stages.values()), 3)
+    return {"font": os.path.basename(font_path), "stages_ms": stages, "pdf_bytes": len(pdf_bytes)}
+
+
+def run_end_to_end(workers, count):
+    """Render ``count`` certificates with ``workers`` processes in this process"""
+    from batch_generator import BatchGenerator
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Generators read the output directory from config (pool workers are handed it)
+        config.OUTPUT_DIR = output_dir
+        settings = {**config.DEFAULT_VISUAL_SETTINGS}
+        batch = BatchGenerator(settings=settings, workers=workers)
+        names = [f"Participant {i:06d}" for i in range(count)]
+        start = time.perf_counter()
+        errors = sum(1 for _, _, error in batch.render(names) if error)
+        elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "workers": workers,
+        "certificates": count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "certs_per_sec": round(count / elapsed, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20, 1),
+        "peak_worker_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20, 1),
+    }
+
+
+def bench_end_to_end(workers, count):
+    """Run one configuration in a fresh interpreter so its peak RSS is its own"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pipeline", "--end-to-end", str(workers), "--count", str(count)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage timing")
+    parser.add_argument("--count", type=int, default=200, help="certificates per end-to-end run")
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    parser.add_argument("--end-to-end", type=int, metavar="WORKERS", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.end_to_end:
+        print(json.dumps(run_end_to_end(args.end_to_end, args.count)))
+        return
+
+    cores = os.cpu_count() or 1
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": cores,
+        "template": TEMPLATE,
+        "stages": [],
+        "end_to_end": [],
+    }
+
+    print(f"Stage timings (median of {args.repeat}, ms)")
+    for font_path in sorted(glob.glob(os.path.join(config.FONTS_DIR, "*.ttf"))):
+        stage = bench_stages(font_path, args.repeat)
+        results["stages"].append(stage)
+        timings = "  ".join(f"{key}={value}" for key, value in stage["stages_ms"].items())
+        print(f"  {stage['font']:<28} {timings}")
+
+    print(f"End to end ({args.count} certificates)")
+    for workers in sorted({1, max(1, cores // 2), cores}):
+        run = bench_end_to_end(workers, args.count)
+        results["end_to_end"].append(run)
+        print(
+            f"  workers={workers:<3} {run['certs_per_sec']:>8} certs/s  "
+            f"peak RSS {run['peak_rss_mb']} MB (worker {run['peak_worker_rss_mb']} MB)"
+        )
+
+    if args.json == "-":
+        print(json.dumps(results, indent=2))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
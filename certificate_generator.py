@@ -1,145 +1,274 @@
 import os
 import io
-import base64
-from PIL import Image, ImageDraw, ImageFont
+import time
+import threading
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
+from asset_cache import assets, convert_to_rgb
+from layout import compile_layout, split_row
+from pdf_writer import draw_jpeg, draw_png, register_font
+from image_encoder import encode_image
+from preview import preview_etag, encode_preview, preview_cache
 import config
 
 
+def certificate_filename(name):
+    """File name a recipient's certificate is saved and uploaded under"""
+    sanitized = "".join(c if c.isalnum() or c in ("_", "-", " ") else "_" for c in name)
+    sanitized = sanitized.replace(" ", "_").strip("_")
+    return f"{sanitized}_certificate.pdf"
+
+
+def write_pdf(path, data):
+    """Write PDF bytes via a temp file and rename, so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
 class CertificateGenerator:
     def __init__(self, settings=None):
         self.settings = settings or config.load_settings()
         self.output_dir = config.OUTPUT_DIR
+        # Seconds per stage (render, encode, pdf) for the last generate_certificate call
+        self.timings = {}
         os.makedirs(self.output_dir, exist_ok=True)
 
     def _get_template_path(self):
         return os.path.join(config.TEMPLATES_DIR, self.settings["template"])
 
-    def _load_font(self):
+    def _get_font_path(self):
+        """Configured font file, else the first available fallback, else None"""
         font_path = self.settings["font_path"]
-        font_size = self.settings["font_size"]
-
         if os.path.exists(font_path):
-            return ImageFont.truetype(font_path, font_size)
+            return font_path
         for path in config.FALLBACK_FONTS:
             if os.path.exists(path):
-                return ImageFont.truetype(path, font_size)
-        return ImageFont.load_default()
+                return path
+        return None
+
+    def _load_font(self, size=None):
+        font_path = self._get_font_path()
+        if font_path:
+            return assets.get_font(font_path, size or self.settings["font_size"])
+        return assets.get_default_font()
 
     def _convert_to_rgb(self, img):
         """Convert image to RGB mode for JPEG compatibility"""
-        if img.mode in ("RGBA", "LA", "P"):
-            # Create a white background for transparent images
-            background = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode == "P":
-                img = img.convert("RGBA")
-            background.paste(img, mask=img.split()[-1] if img.mode in ("RGBA", "LA") else None)
-            return background
-        elif img.mode != "RGB":
-            return img.convert("RGB")
-        return img
-
-    def generate_certificate(self, name):
+        return convert_to_rgb(img)
+
+    def _load_template(self, template_path):
+        """Return a private RGB copy of the cached, already-converted template"""
+        return assets.get_template(template_path).copy()
+
+    def _get_plan(self, template_path, max_width=None):
+        """The compiled layout (name plus any extra fields) for the current settings"""
+        return compile_layout(self.settings, template_path, self._get_font_path(), max_width)
+
+    def warm_up(self):
+        """Compile the layout, loading its template and fonts, ahead of the first render"""
         template_path = self._get_template_path()
+        if os.path.exists(template_path):
+            self._get_plan(template_path)
+        self._load_font()
 
+    def _check_template(self, template_path):
         if not os.path.exists(template_path):
             raise FileNotFoundError(
                 f"Certificate template not found: {template_path}\n"
                 f"Please add a certificate template image to static/templates/."
             )
 
-        img = Image.open(template_path)
-        # Convert to RGB if necessary (for JPEG compatibility)
-        img = self._convert_to_rgb(img)
-        width, height = img.size
-        draw = ImageDraw.Draw(img)
-        font = self._load_font()
-
-        # Get text positioning
-        text_x_position = self.settings.get("text_x_position", 0.5)
-        text_y_position = self.settings.get("text_y_position", 0.44)
-        text_color = tuple(self.settings["text_color"])
-        stroke_width = self.settings["stroke_width"]
-
-        # Calculate text position
-        bbox = draw.textbbox((0, 0), name, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-
-        # Use x position (centered around the point)
-        x = int(width * text_x_position) - text_width // 2
-        y = int(height * text_y_position) - text_height // 2
-
-        draw.text(
-            (x, y), name, fill=text_color, font=font,
-            stroke_width=stroke_width, stroke_fill=text_color
-        )
+    def _get_page_size(self, template_path):
+        """PDF page size: 11in wide, keeping the template's aspect ratio"""
+        width, height = assets.get_template(template_path).size
+        pdf_width = 11 * 72
+        return pdf_width, pdf_width / (width / height)
 
-        # Convert to PDF
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format="JPEG", quality=self.settings["image_quality"])
-        img_buffer.seek(0)
+    def _get_pdf_fonts(self, plan, vector=None):
+        """ReportLab font names for the plan's per-row fields, or None to rasterize"""
+        if vector is None:
+            vector = self.settings.get("output_mode") == "vector"
+        if not vector:
+            return None
+        pdf_fonts = []
+        for field in plan.fields:
+            pdf_font = register_font(field.font_path) if field.font_path else None
+            if not pdf_font:
+                return None
+            pdf_fonts.append(pdf_font)
+        return pdf_fonts
 
-        sanitized = "".join(c if c.isalnum() or c in ("_", "-", " ") else "_" for c in name)
-        sanitized = sanitized.replace(" ", "_").strip("_")
-        pdf_path = os.path.join(self.output_dir, f"{sanitized}_certificate.pdf")
+    def generate_certificate(self, name, output=None, row=None):
+        """Render one certificate and return where it was written
 
-        pdf_width = 11 * 72
-        pdf_height = pdf_width / (width / height)
-        c = canvas.Canvas(pdf_path, pagesize=(pdf_width, pdf_height))
-        c.drawImage(ImageReader(img_buffer), 0, 0, width=pdf_width, height=pdf_height)
+        ``row`` supplies the CSV values for layout fields other than the
+        name. ``output`` defaults to ``output/<name>_certificate.pdf``; it
+        may also be another path or a writable binary file object such as
+        ``BytesIO``, in which case nothing touches the disk.
+        """
+        self.timings = {}
+        start = time.perf_counter()
+        template_path = self._get_template_path()
+        self._check_template(template_path)
+
+        pdf_path = self._get_pdf_path(name) if output is None else output
+        plan = self._get_plan(template_path)
+        pdf_fonts = self._get_pdf_fonts(plan)
+        values = {**(row or {}), config.NAME_COLUMN: name}
+
+        page_size = self._get_page_size(template_path)
+        c = canvas.Canvas(pdf_path, pagesize=page_size)
+        if pdf_fonts:
+            self._draw_vector_page(c, page_size, plan, values, template_path, pdf_fonts)
+        else:
+            self._draw_raster_page(c, page_size, plan, values)
         c.save()
+        # Anything not attributed to drawing or encoding the image is PDF writing
+        self.timings["pdf"] = time.perf_counter() - start - sum(self.timings.values())
 
         return pdf_path
 
-    def generate_preview(self, name="Sample Name", settings=None):
-        """Generate a preview image with the given settings, returns base64 encoded JPEG"""
-        if settings:
-            self.settings = {**self.settings, **settings}
+    def generate_certificate_bytes(self, name, row=None):
+        """Render one certificate in memory and return the PDF bytes"""
+        buffer = io.BytesIO()
+        self.generate_certificate(name, output=buffer, row=row)
+        return buffer.getvalue()
+
+    def generate_merged_pdf(self, names, pdf_path):
+        """Write one page per name into a single PDF and return the page count
+
+        ``names`` may be any iterable of names or CSV row dicts (e.g. a
+        streaming CSV reader). Pages are always drawn in vector mode when the
+        fonts can be embedded: the template is stored once as a shared image
+        XObject, so the file grows only by each page's text.
+        """
+        template_path = self._get_template_path()
+        self._check_template(template_path)
+        plan = self._get_plan(template_path)
+        pdf_fonts = self._get_pdf_fonts(plan, vector=True)
 
+        page_size = self._get_page_size(template_path)
+        c = canvas.Canvas(pdf_path, pagesize=page_size)
+        pages = 0
+        for item in names:
+            _, values = split_row(item)
+            if pdf_fonts:
+                self._draw_vector_page(c, page_size, plan, values, template_path, pdf_fonts)
+            else:
+                self._draw_raster_page(c, page_size, plan, values)
+            c.showPage()
+            pages += 1
+        c.save()
+
+        return pages
+
+    def _get_pdf_path(self, name):
+        return os.path.join(self.output_dir, certificate_filename(name))
+
+    def _draw_raster_page(self, c, page_size, plan, values):
+        """Draw the row's fields into a copy of the plan's base and place it as an encoded image"""
+        start = time.perf_counter()
+        img = plan.render(values)
+        drawn = time.perf_counter()
+
+        image_bytes, image_format = encode_image(
+            img, self.settings.get("encoder_preset", "default"), self.settings["image_quality"]
+        )
+        self.timings["render"] = drawn - start
+        self.timings["encode"] = time.perf_counter() - drawn
+
+        # One name per page keeps merged documents from reusing the first page's image
+        self._draw_image(c, page_size, image_bytes, image_format, f"Page{c.getPageNumber()}")
+
+    def _draw_image(self, c, page_size, image_bytes, image_format, image_name):
+        """Place encoded image bytes over the whole page
+
+        The encoded stream is embedded as-is; ImageReader would decode it
+        again (and recompress PNGs), so it is only used for PNGs PDF can't take.
+        """
+        pdf_width, pdf_height = page_size
+        if image_format == "JPEG":
+            draw_jpeg(c, image_bytes, image_name, 0, 0, pdf_width, pdf_height)
+        elif not draw_png(c, image_bytes, image_name, 0, 0, pdf_width, pdf_height):
+            c.drawImage(ImageReader(io.BytesIO(image_bytes)), 0, 0, width=pdf_width, height=pdf_height)
+
+    def _draw_vector_page(self, c, page_size, plan, values, template_path, pdf_fonts):
+        """Draw the plan's base as a background image and the row's fields as real PDF text
+
+        The base (the template plus any fixed-text fields) is encoded once
+        with the encoder preset and embedded only once per document; a JPEG
+        template with no fixed text goes in as the original file. Each field
+        is set in its TTF registered with ReportLab, positioned with the same
+        metrics the raster path uses.
+        """
+        width, height = plan.base.size
+        preset = self.settings.get("encoder_preset", "default")
+        quality = self.settings["image_quality"]
+        if plan.base is assets.get_template(template_path):
+            image_bytes, image_format, digest = assets.get_template_encoded(template_path, preset, quality)
+        else:
+            image_bytes, image_format, digest = plan.base_encoded(preset, quality)
+
+        pdf_width, pdf_height = page_size
+        scale = pdf_width / width
+
+        self._draw_image(c, page_size, image_bytes, image_format, f"Template{digest}")
+
+        for field, pdf_font in zip(plan.fields, pdf_fonts):
+            value = field.value(values)
+            if not value:
+                continue
+            # Same placement as the raster path, then convert the baseline to PDF space
+            font, x, y = field.place(value, (width, height))
+            ascent, _ = font.getmetrics()
+            baseline = y + ascent
+
+            r, g, b = (channel / 255 for channel in field.color)
+            # Colours and the stroke render mode are graphics state; keep them per field
+            c.saveState()
+            text = c.beginText()
+            text.setTextOrigin(x * scale, pdf_height - baseline * scale)
+            text.setFont(pdf_font, font.size * scale)
+            c.setFillColorRGB(r, g, b)
+            if field.stroke_width:
+                # PDF strokes straddle the outline, so double the width to match PIL's outward stroke
+                c.setStrokeColorRGB(r, g, b)
+                c.setLineWidth(2 * field.stroke_width * scale)
+                c.setLineJoin(1)
+                text.setTextRenderMode(2)
+            text.textOut(value)
+            c.drawText(text)
+            c.restoreState()
+
+    def render_preview(self, name="Sample Name"):
+        """Render a preview directly at preview size; returns a PreviewImage
+
+        The layout is compiled on the template downscaled once to preview
+        width, with proportionally smaller fonts, so each preview only draws
+        the name (and sample values for other columns) and encodes a small
+        image instead of resizing a full-resolution render.
+        """
         template_path = self._get_template_path()
 
         if not os.path.exists(template_path):
             raise FileNotFoundError(f"Template not found: {template_path}")
 
-        img = Image.open(template_path)
-        # Convert to RGB if necessary (for JPEG compatibility)
-        img = self._convert_to_rgb(img)
-        width, height = img.size
-        draw = ImageDraw.Draw(img)
-        font = self._load_font()
-
-        # Get text positioning
-        text_x_position = self.settings.get("text_x_position", 0.5)
-        text_y_position = self.settings.get("text_y_position", 0.44)
-        text_color = tuple(self.settings["text_color"])
-        stroke_width = self.settings["stroke_width"]
-
-        # Calculate text position
-        bbox = draw.textbbox((0, 0), name, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-
-        x = int(width * text_x_position) - text_width // 2
-        y = int(height * text_y_position) - text_height // 2
-
-        draw.text(
-            (x, y), name, fill=text_color, font=font,
-            stroke_width=stroke_width, stroke_fill=text_color
-        )
+        etag = preview_etag(name, self.settings, template_path, self._get_font_path())
+        cached = preview_cache.get(etag)
+        if cached is not None:
+            return cached
 
-        # Resize for preview (max 800px width)
-        max_preview_width = 800
-        if width > max_preview_width:
-            ratio = max_preview_width / width
-            new_size = (max_preview_width, int(height * ratio))
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
+        img = self._get_plan(template_path, config.PREVIEW_WIDTH).render_sample(name)
+        preview = encode_preview(img, etag)
+        preview_cache.put(etag, preview)
+        return preview
 
-        # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG", quality=85)
-        buffer.seek(0)
-        base64_image = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    def generate_preview(self, name="Sample Name", settings=None):
+        """Generate a preview image with the given settings, returns a base64 data URL"""
+        if settings:
+            self.settings = {**self.settings, **settings}
 
-        return f"data:image/jpeg;base64,{base64_image}"
+        return self.render_preview(name).data_url()
@@ -0,0 +1,211 @@
+"""Command-line tools for certificate generation"""
+
+import argparse
+import os
+import sys
+from batch_generator import BatchGenerator
+from certificate_generator import CertificateGenerator
+from csv_reader import read_csv_rows
+from layout import require_columns
+from metrics import StageMetrics, profiled
+from output_cache import BatchCache, output_cache
+from pdf_uploader import PDFUploader
+from progress_store import ProgressStore, md5_file
+from upload_pipeline import UploadPipeline
+import config
+
+
+def _pending_rows(rows, progress, in_flight, dedupe=False):
+    """Yield rows still to be rendered, remembering each one until its result is written
+
+    Only rows between rendering and recording are held in ``in_flight``, and
+    names already in ``progress`` are skipped, so memory stays flat apart
+    from the names of a resumed progress file. With ``dedupe`` every name of
+    this input is also remembered to skip repeats, which costs memory per
+    distinct name.
+    """
+    seen = set() if dedupe else None
+    index = 0
+    for row in rows:
+        name = row[config.NAME_COLUMN].strip()
+        if progress.is_processed(name) or (seen is not None and name in seen):
+            continue
+        if seen is not None:
+            seen.add(name)
+        in_flight[index] = row
+        index += 1
+        yield row
+
+
+def run_command(args):
+    """Stream rows from a CSV (or stdin) through rendering, upload and progress"""
+    source = sys.stdin if args.csv == "-" else open(args.csv, "r", encoding="utf-8", newline="")
+    uploader = None
+    try:
+        fieldnames, rows = read_csv_rows(source)
+        csv_hash = "" if args.csv == "-" else md5_file(args.csv)
+
+        # _pending_rows tracks this run's names itself, so don't index them twice
+        progress = ProgressStore(args.progress, keep_results=False, index_appended=False)
+        if progress.count():
+            if not args.resume:
+                print(
+                    f"✗ {args.progress} already has {progress.count()} row(s). "
+                    f"Use --resume to continue it, or remove the file to start over.",
+                    file=sys.stderr,
+                )
+                return 1
+            existing_hash = progress.csv_hash()
+            if csv_hash and existing_hash and existing_hash != csv_hash:
+                print("✗ CSV changed since the progress file was written, reset progress", file=sys.stderr)
+                return 1
+
+        settings = config.load_settings()
+        require_columns(settings, fieldnames)
+        stage_metrics = StageMetrics()
+        batch_cache = None
+        if config.OUTPUT_CACHE_ENABLED and not args.no_cache:
+            # Dry runs never upload, so they only reuse local PDFs
+            batch_cache = BatchCache(output_cache, settings, None if args.dry_run else config.UPLOAD_SERVICE)
+        batch = BatchGenerator(
+            settings=settings, workers=args.workers, metrics=stage_metrics, cache=batch_cache,
+            # A dry run's whole point is the PDFs in output/
+            in_memory=args.in_memory and not args.dry_run,
+        )
+        in_flight = {}
+        names = _pending_rows(rows, progress, in_flight, dedupe=args.dedupe)
+        renders = batch.render(names)
+
+        if args.dry_run:
+            uploads = ((index, pdf_path, error) for index, pdf_path, error in renders)
+        else:
+            uploader = PDFUploader.from_config()
+            if batch_cache:
+                uploader = batch_cache.cached_uploader(uploader)
+            pipeline = UploadPipeline(uploader, workers=args.upload_workers, metrics=stage_metrics)
+            uploads = pipeline.run(
+                (index, in_flight[index][config.NAME_COLUMN].strip(), pdf, error)
+                for index, pdf, error in renders
+            )
+
+        succeeded = failed = 0
+        for index, url, error in uploads:
+            row = in_flight.pop(index)
+            name = row[config.NAME_COLUMN].strip()
+
+            if error is None:
+                succeeded += 1
+                print(f"✓ {name} -> {url}")
+                result = {**row, "url": url, "status": "success"}
+            else:
+                failed += 1
+                print(f"✗ {name}: {error}")
+                result = {**row, "url": "", "status": "error", "error": "Certificate generation failed"}
+
+            if not args.dry_run:
+                with stage_metrics.timer("progress_write"):
+                    progress.append(result, fieldnames, csv_hash)
+
+        print(f"Done: {succeeded} succeeded, {failed} failed" + (" (dry run, nothing uploaded)" if args.dry_run else ""))
+        if batch_cache:
+            stats = batch_cache.stats()
+            print(f"  reused {stats['renders_skipped']} render(s), {stats['uploads_skipped']} upload(s) from the output cache")
+        for stage, timing in stage_metrics.summary().items():
+            print(f"  {stage:<15} mean {timing['mean_ms']}ms  p95 {timing['p95_ms']}ms  total {timing['total_s']}s")
+        return 0 if not failed else 2
+    except KeyboardInterrupt:
+        print("⚠️  Generation cancelled, progress has been saved", file=sys.stderr)
+        return 130
+    finally:
+        # Also on Ctrl+C or an error, so pooled upload connections are released
+        if uploader is not None:
+            uploader.close()
+        if source is not sys.stdin:
+            source.close()
+
+
+def export_command(args):
+    """Render every row of a CSV into one multi-page PDF"""
+    generator = CertificateGenerator()
+    with open(args.csv, "r", encoding="utf-8", newline="") as f:
+        fieldnames, rows = read_csv_rows(f)
+        require_columns(generator.settings, fieldnames)
+        pages = generator.generate_merged_pdf(rows, args.output)
+    print(f"✓ Wrote {pages} certificate(s) to {args.output}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="certgen", description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="generate and upload certificates without the web UI")
+    run.add_argument("csv", help="recipients CSV, or '-' to read from stdin")
+    run.add_argument(
+        "--workers", "-w", type=int, default=config.RENDER_WORKERS,
+        help=f"render processes (default: {config.RENDER_WORKERS})",
+    )
+    run.add_argument(
+        "--upload-workers", type=int, default=config.UPLOAD_WORKERS,
+        help=f"concurrent uploads (default: {config.UPLOAD_WORKERS})",
+    )
+    run.add_argument(
+        "--progress", default=config.GENERATED_CSV,
+        help=f"progress/results CSV (default: {config.GENERATED_CSV})",
+    )
+    run.add_argument(
+        "--resume", action="store_true",
+        help="skip names already recorded in the progress CSV",
+    )
+    run.add_argument(
+        "--dry-run", action="store_true",
+        help="render PDFs into output/ but don't upload or record progress",
+    )
+    run.add_argument(
+        "--dedupe", action="store_true",
+        help="skip names repeated within the CSV; remembers every name, so memory grows with the input",
+    )
+    run.add_argument(
+        "--no-cache", action="store_true",
+        help="re-render and re-upload even when an identical certificate was made before",
+    )
+    run.add_argument(
+        "--in-memory", action="store_true", default=config.RENDER_TO_MEMORY,
+        help="upload PDFs from memory; output/ copies are saved in the background unless SAVE_LOCAL_PDFS=False",
+    )
+    run.add_argument(
+        "--profile", metavar="PATH",
+        help="profile the run into PATH (.prof for cProfile, .html for pyinstrument)",
+    )
+    run.set_defaults(func=run_command)
+
+    export = subparsers.add_parser("export", help="export all certificates as a single PDF")
+    export.add_argument(
+        "--csv", default=os.path.join(config.UPLOAD_DIR, "current.csv"),
+        help="recipients CSV (default: the last uploaded CSV)",
+    )
+    export.add_argument(
+        "--output", "-o", default=config.MERGED_PDF,
+        help=f"output PDF path (default: {config.MERGED_PDF})",
+    )
+    export.set_defaults(func=export_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if getattr(args, "profile", None):
+            with profiled(args.profile) as path:
+                status = args.func(args)
+            print(f"✓ Profile written to {path}", file=sys.stderr)
+            return status
+        return args.func(args)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 """Certificate Generator Configuration - Customize your settings here"""
 
 import os
+import copy
 import json
+import tempfile
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,27 +23,92 @@ DEFAULT_VISUAL_SETTINGS = {
     "text_y_position": 0.44,
     "text_color": [123, 94, 210],
     "stroke_width": 2,
-    "image_quality": 95
+    "image_quality": 95,
+    # raster: draw the name into the image; vector: template image + embedded TTF text
+    "output_mode": "raster",
+    # How raster certificates are encoded (see image_encoder.ENCODER_PRESETS)
+    "encoder_preset": "default",
+    # Extra text besides the name, e.g. CSV columns or fixed text (see layout.py)
+    "fields": []
 }
 
+OUTPUT_MODES = ("raster", "vector")
+
+
+class SettingsStore:
+    """Parsed settings.json kept in memory until the file changes
+
+    Reads are served from the cached dict and only re-parse the file when its
+    mtime/size changes (e.g. edited by hand). Saves go to a temp file that is
+    renamed over settings.json, so readers never see a half-written file and
+    concurrent saves can't interleave.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._settings = None
+        self._signature = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    settings = json.load(f)
+                    # Merge with defaults to ensure all keys exist
+                    return {**DEFAULT_VISUAL_SETTINGS, **settings}
+            except (json.JSONDecodeError, IOError):
+                pass
+        return DEFAULT_VISUAL_SETTINGS.copy()
+
+    def load(self):
+        with self._lock:
+            signature = self._file_signature()
+            if self._settings is None or signature != self._signature:
+                self._settings = self._read()
+                self._signature = signature
+            # Callers are free to modify what they get back
+            return copy.deepcopy(self._settings)
+
+    def save(self, settings):
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".settings-", suffix=".json", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(settings, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._settings = {**DEFAULT_VISUAL_SETTINGS, **copy.deepcopy(settings)}
+            self._signature = self._file_signature()
+
+    def invalidate(self):
+        with self._lock:
+            self._settings = None
+
+
+settings_store = SettingsStore(SETTINGS_FILE)
+
 
 def load_settings():
     """Load visual settings from JSON file, or return defaults"""
-    if os.path.exists(SETTINGS_FILE):
-        try:
-            with open(SETTINGS_FILE, "r") as f:
-                settings = json.load(f)
-                # Merge with defaults to ensure all keys exist
-                return {**DEFAULT_VISUAL_SETTINGS, **settings}
-        except (json.JSONDecodeError, IOError):
-            pass
-    return DEFAULT_VISUAL_SETTINGS.copy()
+    return settings_store.load()
 
 
 def save_settings(settings):
     """Save visual settings to JSON file"""
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=2)
+    settings_store.save(settings)
 
 
 # Load current settings for backward compatibility
@@ -57,10 +125,42 @@ IMAGE_QUALITY = _settings["image_quality"]
 OUTPUT_DIR = "output"
 UPLOAD_DIR = "uploads"
 GENERATED_CSV = "generated_certificates.csv"
+MERGED_PDF = os.path.join(OUTPUT_DIR, "all_certificates.pdf")
+# fsync the progress file after every row (survives power loss, costs a disk flush per row)
+PROGRESS_FSYNC = os.getenv("PROGRESS_FSYNC", "False").lower() == "true"
 
 # CSV Settings
 NAME_COLUMN = "name"
 
+# Render Cache (decoded templates / parsed fonts kept per process)
+ASSET_CACHE_MAX_TEMPLATES = int(os.getenv("ASSET_CACHE_MAX_TEMPLATES", 4))
+ASSET_CACHE_MAX_FONTS = int(os.getenv("ASSET_CACHE_MAX_FONTS", 32))
+TEXT_TILE_CACHE_SIZE = int(os.getenv("TEXT_TILE_CACHE_SIZE", 1024))
+
+# Settings Preview (rendered at this width; format is jpeg or webp)
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", 800))
+PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "jpeg")
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", 85))
+PREVIEW_CACHE_SIZE = int(os.getenv("PREVIEW_CACHE_SIZE", 256))
+
+# Output Cache (reuse PDFs/URLs for unchanged certificates; local PDFs it tracks are
+# deleted least-recently-used first above the size limit, 0 = no limit)
+OUTPUT_CACHE_ENABLED = os.getenv("OUTPUT_CACHE_ENABLED", "True").lower() == "true"
+OUTPUT_CACHE_INDEX = os.path.join(OUTPUT_DIR, ".render_cache.jsonl")
+OUTPUT_CACHE_MAX_BYTES = int(float(os.getenv("OUTPUT_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+
+# Batch Rendering (number of render processes used by /generate)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+# Upload PDFs straight from memory instead of writing and re-reading output/;
+# copies are then still saved to output/ in the background unless disabled
+RENDER_TO_MEMORY = os.getenv("RENDER_TO_MEMORY", "False").lower() == "true"
+SAVE_LOCAL_PDFS = os.getenv("SAVE_LOCAL_PDFS", "True").lower() == "true"
+
+# Profiling (profile every /generate run, or pass {"profile": true}; format prof = cProfile, html = pyinstrument)
+PROFILE_GENERATION = os.getenv("PROFILE_GENERATION", "False").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "prof")
+
 # Storage Provider (cloudinary|catbox|fileio|tmpfiles)
 UPLOAD_SERVICE = os.getenv("UPLOAD_SERVICE", "cloudinary")
 CLOUDINARY_CONFIG = {
@@ -70,6 +170,20 @@ CLOUDINARY_CONFIG = {
 }
 CLOUDINARY_FOLDER = os.getenv("CLOUDINARY_FOLDER", "demo")
 
+# Upload Pipeline (concurrent uploads; queue size 0 means 2x workers)
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 4))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 0))
+
+# HTTP Upload Connections (keep-alive pool per host, retries on 429/503 and failed connects)
+UPLOAD_POOL_SIZE = int(os.getenv("UPLOAD_POOL_SIZE", 10))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", 3))
+UPLOAD_BACKOFF_FACTOR = float(os.getenv("UPLOAD_BACKOFF_FACTOR", 0.5))
+# (connect, read) seconds; a hung upload fails instead of holding a pooled connection forever
+UPLOAD_TIMEOUT = (
+    float(os.getenv("UPLOAD_CONNECT_TIMEOUT", 10)),
+    float(os.getenv("UPLOAD_READ_TIMEOUT", 60)),
+)
+
 # App Settings
 DEBUG_MODE = os.getenv("DEBUG", "True").lower() == "true"
 PORT = int(os.getenv("PORT", 5000))
@@ -131,6 +245,19 @@ def validate_setup():
     return True
 
 
+# Bulk Email (persistent SMTP sessions; rate limit is messages/sec across all sessions, 0 = unlimited)
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", 4))
+EMAIL_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("EMAIL_MAX_MESSAGES_PER_CONNECTION", 100))
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", 0))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", 1000))
+EMAIL_STATUS_CSV = "email_status.csv"
+
+# Email address validation (deliverability = DNS lookups, cached per domain for the TTL in seconds)
+EMAIL_CHECK_DELIVERABILITY = os.getenv("EMAIL_CHECK_DELIVERABILITY", "False").lower() == "true"
+EMAIL_DOMAIN_CACHE_TTL = int(os.getenv("EMAIL_DOMAIN_CACHE_TTL", 3600))
+EMAIL_VALIDATION_CACHE_SIZE = int(os.getenv("EMAIL_VALIDATION_CACHE_SIZE", 100000))
+
+
 def load_email_config():
     settings = load_settings()
     _email_settings = settings.get("email_config") or {}
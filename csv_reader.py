@@ -0,0 +1,33 @@
+"""Streaming access to recipient CSV files"""
+
+import csv
+import config
+
+
+def read_csv_rows(f):
+    """Return ``(fieldnames, rows)`` for an open CSV file
+
+    ``rows`` is a lazy iterator over rows with a non-empty name, so callers can
+    stream arbitrarily large files. Raises ValueError if the name column is missing.
+    """
+    reader = csv.DictReader(f)
+    fieldnames = reader.fieldnames
+    if config.NAME_COLUMN not in (fieldnames or []):
+        raise ValueError(f"CSV must contain '{config.NAME_COLUMN}' column")
+    rows = (row for row in reader if row.get(config.NAME_COLUMN, "").strip())
+    return fieldnames, rows
+
+
+def iter_csv_rows(filepath):
+    """Yield each row with a name from a CSV file without loading the whole file"""
+    with open(filepath, "r", encoding="utf-8") as f:
+        _, rows = read_csv_rows(f)
+        yield from rows
+
+
+def iter_csv_names(filepath):
+    """Yield each stripped name from a CSV file without loading the whole file"""
+    with open(filepath, "r", encoding="utf-8") as f:
+        _, rows = read_csv_rows(f)
+        for row in rows:
+            yield row[config.NAME_COLUMN].strip()
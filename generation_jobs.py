@@ -0,0 +1,96 @@
+"""Background generation jobs and their per-row result streams"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+
+class GenerationJob:
+    """State of one background /generate run, shared between the worker and readers"""
+
+    def __init__(self, total=0):
+        self.id = uuid.uuid4().hex
+        self.status = "running"
+        self.total = total
+        self.results = []
+        self.summary = {}
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status != "running"
+
+    def add_result(self, result):
+        """Record a finished row and wake any streaming readers"""
+        with self._changed:
+            self.results.append(result)
+            self._changed.notify_all()
+
+    def finish(self, status, summary=None, error=None):
+        with self._changed:
+            self.status = status
+            self.summary = summary or {}
+            self.error = error
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def wait_for_results(self, offset, timeout=None):
+        """Block until there are results past ``offset`` or the job ends
+
+        Returns ``(new_results, done)``; readers keep their own offset, so each
+        call only touches rows they haven't seen yet.
+        """
+        with self._changed:
+            if len(self.results) <= offset and not self.done:
+                self._changed.wait(timeout)
+            return self.results[offset:], self.done
+
+    def to_dict(self):
+        """Summary of the job without its result rows"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "processed_count": len(self.results),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            **self.summary,
+        }
+
+
+class JobManager:
+    """Start generation jobs on background threads and keep the most recent ones around"""
+
+    def __init__(self, max_jobs=20):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, target, total=0):
+        """Run ``target(job)`` on a daemon thread and return the new job"""
+        job = GenerationJob(total=total)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        thread = threading.Thread(target=target, args=(job,), daemon=True, name=f"generation-{job.id}")
+        thread.start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def current(self):
+        """Return the job that is still running, if any"""
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if not job.done:
+                    return job
+        return None
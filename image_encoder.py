@@ -0,0 +1,53 @@
+"""Encoder presets for the certificate image embedded in raster PDFs"""
+
+import io
+from PIL import Image
+
+# Page width the image is placed at, used to turn a target DPI into pixels
+PAGE_WIDTH_INCHES = 11
+
+# quality=None means "use the image_quality setting"; target_dpi downsamples
+# images wider than the page needs at that resolution
+ENCODER_PRESETS = {
+    # What certificates have always used: libjpeg defaults (4:2:0 chroma)
+    "default": {"format": "JPEG", "quality": None},
+    # Full-resolution chroma keeps coloured text edges crisp when printed
+    "print": {"format": "JPEG", "quality": None, "subsampling": 0, "optimize": True},
+    # Screen-sized and quick to encode
+    "fast": {"format": "JPEG", "quality": 85, "subsampling": 2, "target_dpi": 150},
+    # Smallest files for email/download; optimize and progressive cost encode time
+    "small": {"format": "JPEG", "quality": 80, "subsampling": 2, "optimize": True,
+              "progressive": True, "target_dpi": 150},
+    # No compression artifacts, much larger files
+    "lossless": {"format": "PNG", "compress_level": 1},
+}
+
+
+def downscale_for_dpi(img, target_dpi, page_width_inches=PAGE_WIDTH_INCHES):
+    """Shrink ``img`` so it is no wider than the page needs at ``target_dpi``"""
+    max_width = int(page_width_inches * target_dpi)
+    if img.width <= max_width:
+        return img
+    height = round(img.height * max_width / img.width)
+    # Draft-quality: an integer box reduce, then a bilinear pass for the remainder.
+    # About 10x faster than LANCZOS at print sizes and fine at 150+ DPI.
+    return img.resize((max_width, height), Image.Resampling.BILINEAR, reducing_gap=1.0)
+
+
+def encode_image(img, preset="default", quality=95):
+    """Encode a certificate image with a preset; returns ``(bytes, format)``
+
+    Pillow releases the GIL inside its encoders, so calls from several
+    threads run in parallel.
+    """
+    options = dict(ENCODER_PRESETS.get(preset) or ENCODER_PRESETS["default"])
+    image_format = options.pop("format")
+    target_dpi = options.pop("target_dpi", None)
+    if target_dpi:
+        img = downscale_for_dpi(img, target_dpi)
+    if "quality" in options and options["quality"] is None:
+        options["quality"] = quality
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **options)
+    return buffer.getvalue(), image_format
@@ -0,0 +1,293 @@
+"""Multi-field certificate layouts, compiled once into reusable render plans
+
+Besides the recipient's name (placed by the existing font/position
+settings), the ``fields`` setting lists extra text to print:
+
+    {"column": "department", "x": 0.5, "y": 0.58, "font_size": 48}
+    {"text": "Awarded March 2025", "x": 0.9, "y": 0.9, "anchor": "right"}
+
+A field shows either a CSV ``column`` of each row or a fixed ``text``.
+Fixed text is drawn onto the template once per plan, so each certificate
+only draws the fields that change from row to row.
+"""
+
+import os
+import json
+import hashlib
+from asset_cache import assets, file_signature
+from lru_cache import LRUCache
+from text_layer import text_layer, text_origin
+from image_encoder import encode_image
+import config
+
+ANCHORS = ("left", "center", "right")
+
+FIELD_DEFAULTS = {
+    "column": None,
+    "text": None,
+    "x": 0.5,
+    "y": 0.5,
+    "anchor": "center",
+    # Fraction of the template width; longer text is set in a smaller font to fit (0 = no limit)
+    "max_width": 0,
+    # Font, size and colour default to the name's
+    "font_path": None,
+    "font_size": None,
+    "color": None,
+    "stroke_width": 0,
+    # Shown in previews in place of the column's value
+    "sample": None,
+}
+
+# Plans for the layouts in use: one per batch, plus a few preview variations
+_plans = LRUCache(8)
+
+
+def _text_width(font, text):
+    left, _, right, _ = font.getbbox(text)
+    return right - left
+
+
+def name_field(settings):
+    """The recipient's name as a field spec, from the original single-text settings"""
+    return {
+        **FIELD_DEFAULTS,
+        "column": config.NAME_COLUMN,
+        "x": settings.get("text_x_position", 0.5),
+        "y": settings.get("text_y_position", 0.44),
+        "font_path": settings["font_path"],
+        "font_size": settings["font_size"],
+        "color": settings["text_color"],
+        "stroke_width": settings["stroke_width"],
+    }
+
+
+def layout_fields(settings):
+    """Every field to draw, name first, with defaults filled in"""
+    name = name_field(settings)
+    fields = [name]
+    for spec in settings.get("fields") or []:
+        field = {**FIELD_DEFAULTS, **spec}
+        for key in ("font_path", "font_size", "color"):
+            if field[key] is None:
+                field[key] = name[key]
+        fields.append(field)
+    return fields
+
+
+def layout_columns(settings):
+    """CSV columns the extra fields print, e.g. to check a CSV has them"""
+    return sorted({spec["column"] for spec in settings.get("fields") or [] if spec.get("column")})
+
+
+def require_columns(settings, fieldnames):
+    """Raise ValueError if a CSV with these columns lacks one the layout prints"""
+    missing = [column for column in layout_columns(settings) if column not in (fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing column(s) used by the certificate layout: {', '.join(missing)}")
+
+
+def _font_paths(specs, default_font_path):
+    # Fields whose font file is missing are drawn in the default font
+    return [
+        spec["font_path"] if spec["font_path"] and os.path.exists(spec["font_path"]) else default_font_path
+        for spec in specs
+    ]
+
+
+def asset_signatures(settings, template_path, default_font_path=None):
+    """Revisions of the template and of every font the layout draws with, for cache keys"""
+    fonts = _font_paths(layout_fields(settings), default_font_path)
+    return {
+        "template": file_signature(template_path),
+        "fonts": [file_signature(path) for path in fonts],
+    }
+
+
+def _is_int(value):
+    # bool is an int subclass, but true/false in JSON is never a valid size
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return _is_int(value) or isinstance(value, float)
+
+
+def validate_fields(fields):
+    """Return an error message for an invalid ``fields`` setting, or None"""
+    if not isinstance(fields, list):
+        return "fields must be a list"
+    for number, spec in enumerate(fields, 1):
+        if not isinstance(spec, dict):
+            return f"Field {number} must be an object"
+        unknown = set(spec) - set(FIELD_DEFAULTS)
+        if unknown:
+            return f"Field {number} has unknown keys: {', '.join(sorted(unknown))}"
+        for key in ("column", "text", "sample"):
+            if spec.get(key) is not None and not isinstance(spec[key], str):
+                return f"Field {number}: {key} must be a string"
+        if bool(spec.get("column")) == bool(spec.get("text")):
+            return f"Field {number} needs either a column or a text"
+        for key in ("x", "y", "max_width"):
+            value = spec.get(key, FIELD_DEFAULTS[key])
+            if not _is_number(value) or not 0 <= value <= 1:
+                return f"Field {number}: {key} must be between 0 and 1"
+        if spec.get("anchor", "center") not in ANCHORS:
+            return f"Field {number}: anchor must be one of {', '.join(ANCHORS)}"
+        if spec.get("font_path") and not os.path.exists(spec["font_path"]):
+            return f"Field {number}: font not found: {spec['font_path']}"
+        font_size = spec.get("font_size")
+        if font_size is not None and (not _is_int(font_size) or font_size < 1):
+            return f"Field {number}: font_size must be a positive integer"
+        stroke_width = spec.get("stroke_width", 0)
+        if not _is_int(stroke_width) or stroke_width < 0:
+            return f"Field {number}: stroke_width must be a non-negative integer"
+        color = spec.get("color")
+        if color is not None and (
+            not isinstance(color, list) or len(color) != 3
+            or not all(_is_int(c) and 0 <= c <= 255 for c in color)
+        ):
+            return f"Field {number}: color must be [r, g, b]"
+    return None
+
+
+class CompiledField:
+    """One field with its font resolved and sizes scaled to the plan's image"""
+
+    def __init__(self, spec, font_path, scale=1.0):
+        self.column = spec["column"]
+        self.text = spec["text"]
+        self.sample = spec["sample"]
+        self.position = (spec["x"], spec["y"])
+        self.anchor = spec["anchor"]
+        self.max_width = spec["max_width"]
+        self.color = tuple(spec["color"])
+        self.font_path = font_path
+        self.font_size = max(1, round(spec["font_size"] * scale))
+        stroke_width = spec["stroke_width"]
+        # Keep a visible outline rather than rounding it away
+        self.stroke_width = max(1, round(stroke_width * scale)) if stroke_width else 0
+
+    @property
+    def is_static(self):
+        return not self.column
+
+    def value(self, values):
+        if self.is_static:
+            return self.text
+        return (values.get(self.column) or "").strip()
+
+    def sample_value(self):
+        """Stand-in text for previews"""
+        return self.text or self.sample or self.column.replace("_", " ").title()
+
+    def _font(self, size):
+        if self.font_path:
+            return assets.get_font(self.font_path, size)
+        return assets.get_default_font()
+
+    def font_for(self, text, image_width):
+        """The field's font, shrunk until ``text`` fits within max_width"""
+        font = self._font(self.font_size)
+        if not self.max_width:
+            return font
+        limit = self.max_width * image_width
+        width = _text_width(font, text)
+        if width <= limit:
+            return font
+        size = max(1, int(self.font_size * limit / width))
+        font = self._font(size)
+        while size > 1 and _text_width(font, text) > limit:
+            size -= 1
+            font = self._font(size)
+        return font
+
+    def place(self, text, image_size):
+        """Return ``(font, x, y)``: the font and top-left draw origin for ``text``"""
+        font = self.font_for(text, image_size[0])
+        bbox = font.getbbox(text)
+        x, y = text_origin(self.position, image_size, bbox[2] - bbox[0], bbox[3] - bbox[1], self.anchor)
+        return font, x, y
+
+    def draw(self, img, text):
+        if not text:
+            return
+        font = self.font_for(text, img.width)
+        text_layer.draw(img, text, font, self.position, self.color, self.stroke_width, self.anchor)
+
+
+class RenderPlan:
+    """A compiled layout: the base image with static fields drawn, plus the per-row fields
+
+    ``base`` is shared; ``render`` draws onto a copy.
+    """
+
+    def __init__(self, base, fields):
+        self.base = base
+        self.fields = fields
+        self._encoded = {}
+
+    def render(self, values):
+        img = self.base.copy()
+        for field in self.fields:
+            field.draw(img, field.value(values))
+        return img
+
+    def render_sample(self, name):
+        img = self.base.copy()
+        for field in self.fields:
+            field.draw(img, name if field.column == config.NAME_COLUMN else field.sample_value())
+        return img
+
+    def base_encoded(self, preset, quality):
+        """Return ``(bytes, format, digest)`` for the base, encoded once per preset and quality"""
+        encoded = self._encoded.get((preset, quality))
+        if encoded is None:
+            data, image_format = encode_image(self.base, preset, quality)
+            encoded = self._encoded[(preset, quality)] = (data, image_format, hashlib.md5(data).hexdigest())
+        return encoded
+
+
+def compile_layout(settings, template_path, default_font_path=None, max_width=None):
+    """Return the RenderPlan for these settings, compiling it on first use
+
+    Fields whose font is missing fall back to ``default_font_path``. With
+    ``max_width`` the plan is built on the template downscaled to that width
+    (for previews), with font sizes and strokes scaled to match.
+    """
+    specs = layout_fields(settings)
+    font_paths = _font_paths(specs, default_font_path)
+    key = json.dumps(
+        {
+            "template": file_signature(template_path),
+            "max_width": max_width,
+            "fields": specs,
+            "fonts": [file_signature(path) for path in font_paths],
+        },
+        sort_keys=True,
+    )
+    plan = _plans.get(key)
+    if plan is not None:
+        return plan
+
+    if max_width:
+        base, scale = assets.get_template_scaled(template_path, max_width)
+    else:
+        base, scale = assets.get_template(template_path), 1.0
+    fields = [CompiledField(spec, path, scale) for spec, path in zip(specs, font_paths)]
+    static = [field for field in fields if field.is_static]
+    if static:
+        base = base.copy()
+        for field in static:
+            field.draw(base, field.text)
+    plan = RenderPlan(base, [field for field in fields if not field.is_static])
+    _plans.put(key, plan)
+    return plan
+
+
+def split_row(item):
+    """Return ``(name, values)`` for a name or a CSV row dict"""
+    if isinstance(item, str):
+        return item, {config.NAME_COLUMN: item}
+    name = item[config.NAME_COLUMN].strip()
+    return name, {**item, config.NAME_COLUMN: name}
@@ -0,0 +1,158 @@
+"""Per-stage timing histograms for generation runs, exportable in Prometheus format"""
+
+import os
+import time
+import bisect
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# Upper bounds in seconds; covers fast vector renders up to slow uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class StageMetrics:
+    """Thread-safe timings per stage (render, upload, progress write, ...)
+
+    A job-level instance can forward everything to a process-wide ``parent``,
+    so each run gets its own summary while ``/metrics`` sees the totals.
+    """
+
+    def __init__(self, parent=None, buckets=DEFAULT_BUCKETS):
+        self.parent = parent
+        self.buckets = buckets
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if self.parent is not None:
+            self.parent.observe(stage, seconds)
+
+    def observe_all(self, timings):
+        """Record a ``{stage: seconds}`` dict, e.g. timings sent back by a render worker"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+        if self.parent is not None:
+            self.parent.increment(counter, amount)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def summary(self):
+        """Count, total and mean/p50/p95/max (ms) per stage, for job results"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "total_s": round(h.sum, 3),
+                    "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else 0,
+                    "p50_ms": round(h.quantile(0.5) * 1000, 2),
+                    "p95_ms": round(h.quantile(0.95) * 1000, 2),
+                    "max_ms": round(h.max * 1000, 2),
+                }
+                for stage, h in self._stages.items()
+            }
+
+    def to_prometheus(self, prefix="certgen"):
+        """Render the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each certificate generation stage",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+            counters = sorted(self._counters.items())
+        for counter, value in counters:
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profiled(output_path):
+    """Profile the calling thread and write stats to ``output_path``
+
+    Uses pyinstrument (HTML report) when it's installed and the path ends in
+    .html, cProfile (.prof, open with snakeviz or pstats) otherwise. Only the
+    current thread is profiled; render workers and upload threads show up as
+    time spent waiting on them.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if output_path.endswith(".html"):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            output_path = output_path[:-5] + ".prof"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield output_path
+            finally:
+                profiler.stop()
+                with open(output_path, "w") as f:
+                    f.write(profiler.output_html())
+            return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield output_path
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_path)
+
+
+# Process-wide totals served at /metrics
+metrics = StageMetrics()
@@ -0,0 +1,269 @@
+"""Content-addressed cache of rendered PDFs and their uploaded URLs"""
+
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from threading import RLock
+from layout import layout_columns
+from progress_store import SourceFileCache, md5_file
+import config
+
+# Bump when a rendering change should invalidate every cached certificate
+RENDER_CACHE_VERSION = 1
+
+# Seconds an uploaded URL stays reusable per service: None = forever, 0 = never.
+# tmpfiles.org deletes files after about an hour and file.io links die once
+# downloaded, so a later run could otherwise send out dead links.
+URL_MAX_AGE = {
+    "tmpfiles": 0,
+    "fileio": 0,
+}
+
+_asset_hashes = SourceFileCache()
+
+
+def _pdf_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class RenderKeys:
+    """Cache keys for one batch: hash of (name, other printed columns, effective
+    settings, template bytes, font bytes)
+
+    Settings and asset hashes are computed once; each row then costs one md5.
+    """
+
+    def __init__(self, settings):
+        # Imported here: certificate_generator pulls in ReportLab and Pillow
+        from certificate_generator import CertificateGenerator
+
+        generator = CertificateGenerator(settings=settings)
+        template_path = generator._get_template_path()
+        font_path = generator._get_font_path()
+        effective = {key: generator.settings.get(key) for key in config.DEFAULT_VISUAL_SETTINGS}
+        field_fonts = sorted({
+            spec["font_path"] for spec in effective["fields"] or []
+            if spec.get("font_path") and os.path.exists(spec["font_path"])
+        })
+        self.columns = layout_columns(effective)
+        self._prefix = json.dumps(
+            {
+                "version": RENDER_CACHE_VERSION,
+                "settings": effective,
+                "template": _asset_hashes.get(template_path, "md5", md5_file),
+                "font": _asset_hashes.get(font_path, "md5", md5_file) if font_path else None,
+                "field_fonts": [_asset_hashes.get(path, "md5", md5_file) for path in field_fonts],
+            },
+            sort_keys=True,
+        )
+
+    def key(self, name, row=None):
+        """Key for one certificate; ``row`` supplies the layout's other columns"""
+        text = name
+        if self.columns:
+            row = row or {}
+            text = json.dumps([name] + [(row.get(column) or "").strip() for column in self.columns])
+        return hashlib.md5(f"{self._prefix}\0{text}".encode("utf-8")).hexdigest()
+
+
+class OutputCache:
+    """Remember which PDF file and uploaded URL belong to each render key
+
+    The index is an append-only JSON-lines log next to the PDFs, compacted
+    when it grows well past the number of live entries. A cached PDF is only
+    reused while its size/mtime match what was recorded, so a file that was
+    overwritten by a render with other settings is never served for the old
+    key. URLs stay reusable after their local PDF is gone. Local PDFs tracked
+    by the cache are deleted least-recently-used first once they exceed
+    ``max_bytes``.
+    """
+
+    def __init__(self, index_path=None, max_bytes=None):
+        self.index_path = index_path or config.OUTPUT_CACHE_INDEX
+        self.max_bytes = config.OUTPUT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._pdf_bytes = 0
+        self._log_lines = 0
+        self._loaded = False
+        self._lock = RLock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line from an interrupted write
+                    continue
+                self._log_lines += 1
+                key = record.pop("key")
+                entry = self._entries.pop(key, {})
+                entry.update(record)
+                self._entries[key] = entry
+        self._pdf_bytes = sum(
+            entry["signature"][1] for entry in self._entries.values() if entry.get("signature")
+        )
+
+    def _write(self, key, **fields):
+        entry = self._entries.pop(key, {})
+        if "signature" in fields:
+            if entry.get("signature"):
+                self._pdf_bytes -= entry["signature"][1]
+            if fields["signature"]:
+                self._pdf_bytes += fields["signature"][1]
+        entry.update(fields)
+        # Most recently used last, so eviction starts from the front
+        self._entries[key] = entry
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, **fields}) + "\n")
+        self._log_lines += 1
+        if self._log_lines > 2 * len(self._entries) + 1000:
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, entry in self._entries.items():
+                f.write(json.dumps({"key": key, **entry}) + "\n")
+        os.replace(tmp_path, self.index_path)
+        self._log_lines = len(self._entries)
+
+    def cached_pdf(self, key):
+        """Path of a still-valid PDF rendered for this key, or None"""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if not entry or not entry.get("pdf"):
+                return None
+            if _pdf_signature(entry["pdf"]) != entry.get("signature"):
+                return None
+            self._entries.move_to_end(key)
+            return entry["pdf"]
+
+    def cached_url(self, key, service):
+        """URL this key's PDF was already uploaded to with ``service``, or None
+
+        URLs older than the service's URL_MAX_AGE are never returned.
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if not entry or entry.get("service") != service or not entry.get("url"):
+                return None
+            max_age = URL_MAX_AGE.get(service)
+            if max_age is not None and time.time() - entry.get("uploaded_at", 0) >= max_age:
+                return None
+            return entry["url"]
+
+    def put_pdf(self, key, pdf_path):
+        with self._lock:
+            self._load()
+            self._write(key, pdf=pdf_path, signature=_pdf_signature(pdf_path))
+            self._evict(keep=key)
+
+    def put_url(self, key, service, url):
+        with self._lock:
+            self._load()
+            self._write(key, service=service, url=url, uploaded_at=time.time())
+
+    def _evict(self, keep=None):
+        """Delete the least recently used cached PDFs until under max_bytes"""
+        if not self.max_bytes or self._pdf_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self._pdf_bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if key == keep or not entry.get("signature"):
+                continue
+            # Only delete the file if it still holds this key's render
+            if _pdf_signature(entry["pdf"]) == entry["signature"]:
+                try:
+                    os.remove(entry["pdf"])
+                except OSError:
+                    pass
+            self._write(key, pdf=None, signature=None)
+            # _write moved it to the end; eviction shouldn't count as a use
+            self._entries.move_to_end(key, last=False)
+
+
+class BatchCache:
+    """An OutputCache bound to one batch's settings and upload service
+
+    ``service=None`` (e.g. a dry run) only reuses local PDFs, never URLs.
+    """
+
+    def __init__(self, cache, settings, service=None):
+        self.cache = cache
+        self.keys = RenderKeys(settings)
+        self.service = service
+        self.renders_skipped = 0
+        self.uploads_skipped = 0
+        # Uploaders only get the name; remember rows' keys from lookup until upload
+        self._row_keys = {}
+
+    def _key(self, name, row=None):
+        key = self.keys.key(name, row)
+        if self.keys.columns:
+            self._row_keys[name] = key
+        return key
+
+    def upload_key(self, name):
+        """Key for the certificate about to be uploaded under ``name``"""
+        return self._row_keys.pop(name, None) or self.keys.key(name)
+
+    def reusable(self, name, row=None):
+        """Return ``(skip_render, pdf_path)``; pdf_path is None when only the URL is cached"""
+        key = self._key(name, row)
+        pdf_path = self.cache.cached_pdf(key)
+        if not pdf_path and not (self.service and self.cache.cached_url(key, self.service)):
+            return False, None
+        self.renders_skipped += 1
+        return True, pdf_path
+
+    def record_pdf(self, name, pdf_path, row=None):
+        self.cache.put_pdf(self.keys.key(name, row), pdf_path)
+
+    def cached_uploader(self, uploader):
+        return CachedUploader(uploader, self)
+
+    def stats(self):
+        return {"renders_skipped": self.renders_skipped, "uploads_skipped": self.uploads_skipped}
+
+
+class CachedUploader:
+    """Uploader wrapper that reuses URLs already recorded for identical certificates"""
+
+    def __init__(self, uploader, batch_cache):
+        self.uploader = uploader
+        self.batch_cache = batch_cache
+
+    def upload(self, pdf, name):
+        cache, service = self.batch_cache.cache, self.batch_cache.service
+        key = self.batch_cache.upload_key(name)
+        url = cache.cached_url(key, service)
+        if url:
+            self.batch_cache.uploads_skipped += 1
+            return url
+        url = self.uploader.upload(pdf, name)
+        cache.put_url(key, service, url)
+        return url
+
+    def close(self):
+        self.uploader.close()
+
+
+# Shared index for output/ in this process
+output_cache = OutputCache()
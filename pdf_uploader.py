@@ -1,17 +1,56 @@
 import requests
+import io
 import os
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util import Timeout
+from urllib3.util.retry import Retry
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+from certificate_generator import certificate_filename, write_pdf
+import config
+
+
+@contextmanager
+def open_pdf(pdf, name):
+    """Yield ``(filename, file)`` for a PDF given as a path, bytes or a binary file object"""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        yield certificate_filename(name), io.BytesIO(pdf)
+    elif hasattr(pdf, 'read'):
+        if pdf.seekable():
+            pdf.seek(0)
+        filename = getattr(pdf, 'name', None)
+        yield os.path.basename(filename) if isinstance(filename, str) else certificate_filename(name), pdf
+    else:
+        with open(pdf, 'rb') as f:
+            yield os.path.basename(pdf), f
+
 
 class PDFUploader:
     """Upload PDFs to file hosting services and get shareable links"""
 
-    def __init__(self, service='fileio', cloudinary_config=None, cloudinary_folder='demo'):
-        """Initialize the uploader"""
+    ENDPOINTS = {
+        'fileio': "https://file.io/",
+        'tmpfiles': "https://tmpfiles.org/api/v1/upload",
+        'catbox': "https://catbox.moe/user/api.php",
+    }
+
+    # Statuses where the host refused the request without storing anything
+    RETRY_STATUSES = (429, 503)
+
+    def __init__(self, service='fileio', cloudinary_config=None, cloudinary_folder='demo', endpoint=None,
+                 pool_size=10, max_retries=3, backoff_factor=0.5, timeout=(10, 60)):
+        """Initialize the uploader (endpoint overrides the HTTP service URL, e.g. for a local stub)
+
+        ``timeout`` is ``(connect, read)`` in seconds for every upload request.
+        """
         self.service = service
         self.cloudinary_config = cloudinary_config
         self.cloudinary_folder = cloudinary_folder
+        self.endpoint = endpoint or self.ENDPOINTS.get(service)
+        self.timeout = timeout
+        self.session = self._create_session(pool_size, max_retries, backoff_factor)
 
         if service == 'cloudinary':
             if not cloudinary_config:
@@ -23,20 +62,82 @@ class PDFUploader:
                 secure=True
             )
 
-    def upload(self, file_path, name):
-        """Upload a file and return its public URL"""
+    @classmethod
+    def from_config(cls):
+        """Build an uploader for the storage service configured in config.py / .env"""
+        pool_options = {
+            'pool_size': config.UPLOAD_POOL_SIZE,
+            'max_retries': config.UPLOAD_MAX_RETRIES,
+            'backoff_factor': config.UPLOAD_BACKOFF_FACTOR,
+            'timeout': config.UPLOAD_TIMEOUT,
+        }
+        if config.UPLOAD_SERVICE == 'cloudinary':
+            return cls(
+                service=config.UPLOAD_SERVICE,
+                cloudinary_config=config.get_cloudinary_config(),
+                cloudinary_folder=config.CLOUDINARY_FOLDER,
+                **pool_options
+            )
+        return cls(service=config.UPLOAD_SERVICE, **pool_options)
+
+    def _create_session(self, pool_size, max_retries, backoff_factor):
+        """Build a keep-alive session shared by all uploads from this instance
+
+        pool_size caps the open connections per host; pool_block makes extra
+        upload threads wait for a free connection instead of opening new ones.
+
+        Uploads are POSTs, so only failures where the host can't have stored
+        the file are retried: connection errors and RETRY_STATUSES. A read
+        error or a 5xx after the body was sent is not retried, since trying
+        again could upload the certificate twice.
+        """
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            other=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            # Include POST, limited to the safe cases above
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=len(self.ENDPOINTS),
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        """Close pooled HTTP connections"""
+        self.session.close()
+
+    def upload(self, pdf, name):
+        """Upload a PDF and return its public URL
+
+        ``pdf`` may be a file path, the PDF bytes or a binary file object.
+        """
         if self.service == 'cloudinary':
-            return self._upload_cloudinary(file_path, name)
+            upload = self._upload_cloudinary
         elif self.service == 'fileio':
-            return self._upload_fileio(file_path)
+            upload = self._upload_fileio
         elif self.service == 'tmpfiles':
-            return self._upload_tmpfiles(file_path)
+            upload = self._upload_tmpfiles
         elif self.service == 'catbox':
-            return self._upload_catbox(file_path)
+            upload = self._upload_catbox
         else:
             raise ValueError(f"Unknown service: {self.service}")
 
-    def _upload_cloudinary(self, file_path, name):
+        with open_pdf(pdf, name) as (filename, f):
+            return upload(filename, f, name)
+
+    def _upload_cloudinary(self, filename, f, name):
         """Upload to Cloudinary"""
         try:
             sanitized_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
@@ -44,10 +145,11 @@ class PDFUploader:
             public_id = f"{self.cloudinary_folder}/{sanitized_name}"
 
             response = cloudinary.uploader.upload(
-                file_path,
+                f,
                 resource_type="raw",
                 public_id=public_id,
-                overwrite=True
+                overwrite=True,
+                timeout=Timeout(connect=self.timeout[0], read=self.timeout[1])
             )
 
             secure_url = response.get('secure_url')
@@ -59,56 +161,53 @@ class PDFUploader:
         except Exception as e:
             raise Exception(f"Cloudinary upload failed: {str(e)}")
 
-    def _upload_fileio(self, file_path):
+    def _upload_fileio(self, filename, f, name):
         """Upload to file.io"""
-        url = "https://file.io/"
+        url = self.endpoint
 
-        with open(file_path, 'rb') as f:
-            files = {'file': f}
-            data = {'expires': '1y'}
+        files = {'file': (filename, f)}
+        data = {'expires': '1y'}
 
-            response = requests.post(url, files=files, data=data)
-            response.raise_for_status()
+        response = self.session.post(url, files=files, data=data, timeout=self.timeout)
+        response.raise_for_status()
 
-            result = response.json()
-            if result.get('success'):
-                return result['link']
-            else:
-                raise Exception(f"Upload failed: {result.get('message', 'Unknown error')}")
+        result = response.json()
+        if result.get('success'):
+            return result['link']
+        else:
+            raise Exception(f"Upload failed: {result.get('message', 'Unknown error')}")
 
-    def _upload_tmpfiles(self, file_path):
+    def _upload_tmpfiles(self, filename, f, name):
         """Upload to tmpfiles.org"""
-        url = "https://tmpfiles.org/api/v1/upload"
-
-        with open(file_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(url, files=files)
-            response.raise_for_status()
-
-            result = response.json()
-            if result.get('status') == 'success':
-                original_url = result['data']['url']
-                download_url = original_url.replace('tmpfiles.org/', 'tmpfiles.org/dl/')
-                return download_url
-            else:
-                raise Exception(f"Upload failed: {result.get('message', 'Unknown error')}")
+        url = self.endpoint
+
+        files = {'file': (filename, f)}
+        response = self.session.post(url, files=files, timeout=self.timeout)
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get('status') == 'success':
+            original_url = result['data']['url']
+            download_url = original_url.replace('tmpfiles.org/', 'tmpfiles.org/dl/')
+            return download_url
+        else:
+            raise Exception(f"Upload failed: {result.get('message', 'Unknown error')}")
 
-    def _upload_catbox(self, file_path):
+    def _upload_catbox(self, filename, f, name):
         """Upload to catbox.moe"""
-        url = "https://catbox.moe/user/api.php"
+        url = self.endpoint
 
-        with open(file_path, 'rb') as f:
-            files = {'fileToUpload': f}
-            data = {'reqtype': 'fileupload'}
+        files = {'fileToUpload': (filename, f)}
+        data = {'reqtype': 'fileupload'}
 
-            response = requests.post(url, files=files, data=data)
-            response.raise_for_status()
+        response = self.session.post(url, files=files, data=data, timeout=self.timeout)
+        response.raise_for_status()
 
-            file_url = response.text.strip()
-            if file_url.startswith('http'):
-                return file_url
-            else:
-                raise Exception(f"Upload failed: {file_url}")
+        file_url = response.text.strip()
+        if file_url.startswith('http'):
+            return file_url
+        else:
+            raise Exception(f"Upload failed: {file_url}")
 
 
 class LocalFileStore:
@@ -118,7 +217,15 @@ class LocalFileStore:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
 
-    def upload(self, file_path, name):
-        """Return a file:// URL to the local file"""
+    def upload(self, pdf, name):
+        """Return a file:// URL to the local file, saving it first if it was rendered in memory"""
+        if isinstance(pdf, (str, os.PathLike)):
+            file_path = pdf
+        else:
+            with open_pdf(pdf, name) as (filename, f):
+                file_path = write_pdf(os.path.join(self.output_dir, filename), f.read())
         abs_path = os.path.abspath(file_path)
         return f"file://{abs_path}"
+
+    def close(self):
+        """Nothing to release; matches PDFUploader.close()"""
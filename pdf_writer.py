@@ -0,0 +1,150 @@
+"""ReportLab helpers for embedding pre-encoded images and TrueType fonts"""
+
+import io
+import os
+import struct
+from threading import Lock
+from reportlab.pdfbase import pdfdoc, pdfmetrics, pdfutils
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+_JPEG_COLOR_SPACES = {1: "DeviceGray", 3: "DeviceRGB", 4: "DeviceCMYK"}
+# PNG colour type -> (PDF colour space, components) for the types PDF can take as-is
+_PNG_COLOR_SPACES = {0: ("DeviceGray", 1), 2: ("DeviceRGB", 3)}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_registered_fonts = {}
+_font_lock = Lock()
+
+
+def _jpeg_xobject(name, jpeg_bytes):
+    """Build an image XObject that carries the JPEG stream as-is (DCTDecode)"""
+    width, height, components = pdfutils.readJPEGInfo(io.BytesIO(jpeg_bytes))[:3]
+    xobject = pdfdoc.PDFImageXObject(name)
+    xobject.width = width
+    xobject.height = height
+    xobject.bitsPerComponent = 8
+    xobject.colorSpace = _JPEG_COLOR_SPACES.get(components, "DeviceCMYK")
+    if components == 4:
+        xobject._dotrans = 1
+    xobject.streamContent = jpeg_bytes
+    xobject._filters = ("DCTDecode",)
+    xobject.mask = None
+    return xobject
+
+
+class _PNGImageXObject(pdfdoc.PDFImageXObject):
+    """Image XObject whose stream is PNG IDAT data, undone by FlateDecode + PNG predictors"""
+
+    def format(self, document):
+        stream = pdfdoc.PDFStream(content=self.streamContent)
+        header = stream.dictionary
+        header["Type"] = pdfdoc.PDFName("XObject")
+        header["Subtype"] = pdfdoc.PDFName("Image")
+        header["Width"] = self.width
+        header["Height"] = self.height
+        header["BitsPerComponent"] = 8
+        header["ColorSpace"] = pdfdoc.PDFName(self.colorSpace)
+        header["Filter"] = pdfdoc.PDFName("FlateDecode")
+        header["DecodeParms"] = pdfdoc.PDFDictionary(
+            {"Predictor": 15, "Colors": self.colors, "BitsPerComponent": 8, "Columns": self.width}
+        )
+        header["Length"] = len(self.streamContent)
+        return stream.format(document)
+
+
+def _png_xobject(name, png_bytes):
+    """Build an image XObject from a PNG's compressed data, or None if PDF can't take it as-is
+
+    Only 8-bit, non-interlaced greyscale/RGB without transparency qualifies;
+    that covers what the encoder presets write.
+    """
+    if not png_bytes.startswith(_PNG_SIGNATURE):
+        return None
+    offset = len(_PNG_SIGNATURE)
+    header = None
+    idat = []
+    while offset + 8 <= len(png_bytes):
+        length, chunk_type = struct.unpack(">I4s", png_bytes[offset:offset + 8])
+        data = png_bytes[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if chunk_type == b"IHDR":
+            header = struct.unpack(">IIBBBBB", data)
+        elif chunk_type == b"IDAT":
+            idat.append(data)
+        elif chunk_type == b"tRNS":
+            return None
+        elif chunk_type == b"IEND":
+            break
+    if not header or not idat:
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or interlace or color_type not in _PNG_COLOR_SPACES:
+        return None
+
+    xobject = _PNGImageXObject(name)
+    xobject.width = width
+    xobject.height = height
+    xobject.colorSpace, xobject.colors = _PNG_COLOR_SPACES[color_type]
+    xobject.streamContent = b"".join(idat)
+    return xobject
+
+
+def _draw_xobject(c, name, build, x, y, width, height):
+    reg_name = c._doc.getXObjectName(name)
+    if not c._doc.idToObject.get(reg_name):
+        xobject = build(name)
+        c._setXObjects(xobject)
+        c._doc.Reference(xobject, reg_name)
+        c._doc.addForm(name, xobject)
+
+    c.saveState()
+    c.translate(x, y)
+    c.scale(width, height)
+    c._code.append(f"/{reg_name} Do")
+    c.restoreState()
+    c._formsinuse.append(name)
+
+
+def draw_jpeg(c, jpeg_bytes, name, x, y, width, height):
+    """Draw already-encoded JPEG bytes on a canvas without decoding them
+
+    ``name`` identifies the image within the document: drawing the same name
+    again (e.g. on another page) reuses the XObject instead of embedding a
+    second copy.
+    """
+    _draw_xobject(c, name, lambda name: _jpeg_xobject(name, jpeg_bytes), x, y, width, height)
+
+
+def draw_png(c, png_bytes, name, x, y, width, height):
+    """Like draw_jpeg for PNG bytes; returns False if the PNG needs decoding first
+
+    PDF's FlateDecode filter with PNG predictors reads the PNG's IDAT data
+    directly, so nothing is decompressed or recompressed.
+    """
+    xobject = None
+    if not c._doc.idToObject.get(c._doc.getXObjectName(name)):
+        xobject = _png_xobject(name, png_bytes)
+        if xobject is None:
+            return False
+    _draw_xobject(c, name, lambda name: xobject, x, y, width, height)
+    return True
+
+
+def register_font(font_path):
+    """Register a TTF with ReportLab once per file revision and return its name
+
+    Returns None when ReportLab can't embed the font (e.g. CFF-based OTF files).
+    """
+    stat = os.stat(font_path)
+    key = (os.path.abspath(font_path), stat.st_mtime_ns)
+    with _font_lock:
+        if key not in _registered_fonts:
+            font_name = f"CertFont{len(_registered_fonts)}"
+            try:
+                # asciiReadable would embed every ASCII glyph; without it the
+                # subset holds only the glyphs a document actually uses
+                pdfmetrics.registerFont(TTFont(font_name, font_path, asciiReadable=False))
+            except (TTFError, ValueError, OSError):
+                font_name = None
+            _registered_fonts[key] = font_name
+        return _registered_fonts[key]
@@ -0,0 +1,212 @@
+"""Indexed access to generation progress without re-reading generated_certificates.csv"""
+
+import os
+import csv
+import io
+import hashlib
+from threading import RLock
+import config
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class SourceFileCache:
+    """Memoize values derived from a file (hash, row count, ...) until the file changes"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = RLock()
+
+    def get(self, path, key, compute):
+        signature = _file_signature(path)
+        cache_key = (os.path.abspath(path), key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] == signature:
+                return entry[1]
+        value = compute(path)
+        with self._lock:
+            self._entries[cache_key] = (signature, value)
+        return value
+
+
+def md5_file(path, chunk_size=1024 * 1024):
+    """MD5 of a file, read in chunks so large uploads don't sit in memory"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProgressStore:
+    """Append-only progress log with an in-memory index
+
+    The log is the same ``generated_certificates.csv`` the app has always
+    written, so existing progress files keep working. Rows appended through
+    the store are indexed as they are written; rows appended by another
+    process are picked up by parsing only the bytes past the last known
+    offset. A torn final line (from a crash mid-write) is dropped when the log
+    is opened, so a resumed run never appends onto half a row.
+    """
+
+    def __init__(self, path=None, fsync=None, keep_results=True, index_appended=True):
+        """``keep_results=False`` indexes only names and counts, for very large runs;
+        ``index_appended=False`` also leaves names appended through this store
+        out of the index (for writers that track their own duplicates)
+        """
+        self.path = path or config.GENERATED_CSV
+        self.fsync = config.PROGRESS_FSYNC if fsync is None else fsync
+        self.keep_results = keep_results
+        self.index_appended = index_appended
+        self._lock = RLock()
+        self._reset_index()
+
+    def _reset_index(self):
+        self._results = []
+        self._count = 0
+        self._processed = set()
+        self._csv_hash = None
+        self._header = None
+        self._offset = 0
+        self._signature = None
+
+    def _index_row(self, row, appended=False):
+        # Clean up any None keys that might exist from mismatched columns
+        cleaned_row = {k: v for k, v in row.items() if k is not None}
+        # Ensure error field exists
+        if "error" not in cleaned_row:
+            cleaned_row["error"] = ""
+        self._count += 1
+        if self.keep_results:
+            self._results.append(cleaned_row)
+        if config.NAME_COLUMN in cleaned_row and (self.index_appended or not appended):
+            self._processed.add(cleaned_row[config.NAME_COLUMN])
+        if self._csv_hash is None:
+            self._csv_hash = cleaned_row.get("_csv_hash")
+
+    def _repair_torn_tail(self):
+        """Cut a trailing partial row left behind by an interrupted write"""
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if not size:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+
+    def _refresh(self):
+        """Bring the index up to date with the file on disk"""
+        if not os.path.exists(self.path):
+            if self._signature is not None:
+                self._reset_index()
+            return
+
+        signature = _file_signature(self.path)
+        if signature == self._signature:
+            return
+
+        if (
+            self._signature is None
+            or signature[0] != self._signature[0]
+            or signature[2] < self._offset
+        ):
+            # First load, or the file was replaced/truncated: index from scratch
+            self._reset_index()
+            self._repair_torn_tail()
+            signature = _file_signature(self.path)
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        # Only consume complete lines; a row still being written is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        if end:
+            lines = io.StringIO(chunk[:end].decode("utf-8"), newline="")
+            if self._header is None:
+                self._header = next(csv.reader(lines), None)
+            if self._header:
+                for row in csv.DictReader(lines, fieldnames=self._header):
+                    self._index_row(row)
+            self._offset += end
+        self._signature = signature
+
+    def count(self):
+        """Number of rows recorded so far"""
+        with self._lock:
+            self._refresh()
+            return self._count
+
+    def since(self, offset=0, limit=None):
+        """Rows recorded at or after ``offset`` (at most ``limit`` of them)"""
+        with self._lock:
+            self._refresh()
+            end = None if limit is None else offset + limit
+            return self._results[offset:end]
+
+    def processed_count(self):
+        """Number of distinct names recorded so far"""
+        with self._lock:
+            self._refresh()
+            return len(self._processed)
+
+    def is_processed(self, name):
+        with self._lock:
+            self._refresh()
+            return name in self._processed
+
+    def processed_names(self):
+        with self._lock:
+            self._refresh()
+            return set(self._processed)
+
+    def csv_hash(self):
+        """Hash of the source CSV this progress belongs to"""
+        with self._lock:
+            self._refresh()
+            return self._csv_hash
+
+    def append(self, result, fieldnames, csv_hash):
+        """Append a single result to the log (creates file if doesn't exist)"""
+        output_fields = ["_csv_hash"] + list(
+            dict.fromkeys(list(fieldnames) + ["url", "status", "error"])
+        )
+        with self._lock:
+            self._refresh()
+            write_header = self._header is None
+            # Rows follow the header already in the file, so columns never shift
+            header = output_fields if write_header else self._header
+
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=header, extrasaction="ignore")
+            if write_header:
+                writer.writeheader()
+            record = {**result, "_csv_hash": csv_hash}
+            writer.writerow(record)
+            data = buffer.getvalue().encode("utf-8")
+
+            # One write per row keeps a crash from interleaving partial rows
+            with open(self.path, "ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+            self._header = header
+            self._index_row({field: record.get(field, "") for field in header}, appended=True)
+            self._offset += len(data)
+            self._signature = _file_signature(self.path)
+
+    def reset(self):
+        """Delete the progress log"""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._reset_index()
@@ -1,10 +1,140 @@
+import re
+import time
+import queue
+import base64
+import random
 import logging
-from smtplib import SMTP
+import threading
+from smtplib import SMTP, SMTPServerDisconnected
 from config import load_email_config
+import config as app_config
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from functools import wraps
-from email_validator import validate_email, EmailNotValidError
+from email.header import Header
+from email.utils import formataddr
+from functools import wraps, lru_cache
+from services.email_validation import address_validator
+
+
+REQUIRED_SETTINGS = [
+    "smtp_host",
+    "smtp_port",
+    "smtp_username",
+    "smtp_password",
+    "smtp_from_email"
+]
+
+DEFAULT_EMAIL_SUBJECT = "Certificated Successfully Generated"
+
+OPTIONAL_SETTINGS = [
+    ("smtp_use_tls", True),
+    ("smtp_from_name", "Certificate Generator"),
+    ("email_subject", DEFAULT_EMAIL_SUBJECT),
+    ("email_template", ""),
+]
+
+
+DEFAULT_EMAIL_TEMPLATE = "Hello {name},\n\nYour certificate is ready: {url}\n"
+
+
+# {column} placeholders; anything that isn't a row field (e.g. inline CSS) is left as written
+_PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+class EmailTemplate:
+    """An email template split once into literal text and placeholder lookups"""
+
+    def __init__(self, source):
+        self.source = source
+        parts = _PLACEHOLDER.split(source)
+        self._literals = parts[0::2]
+        self._placeholders = [(f"{{{field}}}", field.strip()) for field in parts[1::2]]
+        self.fields = tuple(dict.fromkeys(key for _, key in self._placeholders))
+
+    def render(self, fields):
+        if not self._placeholders:
+            return self.source
+        out = [self._literals[0]]
+        for (placeholder, key), literal in zip(self._placeholders, self._literals[1:]):
+            value = fields.get(key)
+            out.append(placeholder if value is None else str(value))
+            out.append(literal)
+        return "".join(out)
+
+
+@lru_cache(maxsize=64)
+def compile_email_template(source):
+    """Compile a template once; the same settings string reuses the compiled form"""
+    return EmailTemplate(source or DEFAULT_EMAIL_TEMPLATE)
+
+
+def render_email_template(template, fields):
+    """Fill ``{column}`` placeholders in an email template from a row's fields"""
+    return compile_email_template(template).render(fields)
+
+
+def build_message(smtp_config, subject, body, recipient_email):
+    """Build the MIME message sent for a certificate email"""
+    msg = MIMEMultipart()
+    msg['From'] = formataddr((smtp_config["smtp_from_name"], smtp_config["smtp_from_email"]))
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def _encode_header(value):
+    if value.isascii():
+        return value
+    return Header(value, "utf-8").encode()
+
+
+class MessagePrototype:
+    """Serialize certificate emails from a skeleton built once per sender
+
+    Produces the same MIME structure as ``build_message(...).as_string()``
+    (multipart/mixed with one text/plain part) but only fills in the
+    per-recipient To, Subject and body instead of building and flattening a
+    message tree each time. Values the fast path can't handle safely fall
+    back to ``build_message``.
+    """
+
+    def __init__(self, smtp_config):
+        self._smtp_config = smtp_config
+        self._boundary = "=" * 15 + f"{random.randrange(10 ** 19):019d}" + "=="
+        from_header = _encode_header(
+            formataddr((smtp_config["smtp_from_name"], smtp_config["smtp_from_email"]))
+        )
+        self._head = (
+            f'Content-Type: multipart/mixed; boundary="{self._boundary}"\n'
+            "MIME-Version: 1.0\n"
+            f"From: {from_header}\n"
+        )
+        part_head = "Content-Type: text/plain; charset=\"{}\"\nMIME-Version: 1.0\nContent-Transfer-Encoding: {}\n\n"
+        self._ascii_part = f"\n--{self._boundary}\n" + part_head.format("us-ascii", "7bit")
+        self._utf8_part = f"\n--{self._boundary}\n" + part_head.format("utf-8", "base64")
+        self._tail = f"\n--{self._boundary}--\n"
+
+    def render(self, recipient_email, subject, body):
+        """Return the message as a string ready for ``sendmail``"""
+        if (
+            "\n" in recipient_email or "\r" in recipient_email
+            or "\n" in subject or "\r" in subject
+            or self._boundary in body
+        ):
+            return build_message(self._smtp_config, subject, body, recipient_email).as_string()
+
+        if body.isascii():
+            part = self._ascii_part
+        else:
+            part = self._utf8_part
+            body = base64.encodebytes(body.encode("utf-8")).decode("ascii")
+        return "".join((
+            self._head,
+            "To: ", _encode_header(recipient_email), "\n",
+            "Subject: ", _encode_header(subject), "\n",
+            part, body, self._tail,
+        ))
 
 
 def initialization_required(f):
@@ -32,26 +162,12 @@ class EmailService:
     def __init__(self, config=None, raise_exception=False, connection_timeout=30, logger=None):
         self._initialized = True
         self._init_error = ""
+        self._raise_exception = raise_exception
         init_config = config or load_email_config()
         self._logger = logger or self.create_logger()
 
-        required_settings = [
-            "smtp_host",
-            "smtp_port",
-            "smtp_username",
-            "smtp_password",
-            "smtp_from_email"
-        ]
-
-        optional_settings = [
-            ("smtp_use_tls", True),
-            ("smtp_from_name", "Certificate Generator"),
-            ("email_subject", "Certificated Successfully Generated"),
-            ("email_template", ""),
-        ]
-
         required_key_exc_msg = "Invalid Email Configuration. {} was not provided."
-        for key in required_settings:
+        for key in REQUIRED_SETTINGS:
             if not init_config[key]:
                 self._init_error = required_key_exc_msg.format(key)
                 if raise_exception:
@@ -66,7 +182,7 @@ class EmailService:
                     raise Exception(f"Email Service Initialization Error: {self._init_error}")
                 break
 
-        for setting, default in optional_settings:
+        for setting, default in OPTIONAL_SETTINGS:
             if not init_config.get(setting):
                 self._smtp_config[setting] = default
             else:
@@ -102,25 +218,20 @@ class EmailService:
     def send_email(self, subject, body, recipient_email):
         try:
             email_address = self._smtp_config["smtp_from_email"]
-            msg = MIMEMultipart()
-            msg['From'] = self._smtp_config["smtp_from_name"]
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
+            msg = build_message(self._smtp_config, subject, body, recipient_email)
 
             self._smtp_client_session.sendmail(email_address, recipient_email, msg.as_string())
 
             self._logger.info("Email sent successfully!")
         except Exception as e:
             self._logger.exception(f"Failed to send email: {e}")
+            if self._raise_exception:
+                raise
 
 
     def validate_email_address(self, email, check_deliverability=True): 
-        try:
-            validate_email(email, check_deliverability=check_deliverability)
-            return True
-        except EmailNotValidError as e:
-            return False
+        # Domain lookups are cached, so repeated service setups don't repeat DNS queries
+        return address_validator.is_valid(email, check_deliverability=check_deliverability)
     
 
     def create_logger(self):
@@ -135,3 +246,209 @@ class EmailService:
     def __del__(self):
         if self._smtp_client_session:
             self._smtp_client_session.quit()
+
+
+class SMTPSession:
+    """One authenticated SMTP connection that reconnects when the server drops it
+
+    The connection is opened lazily and recycled after ``max_messages`` sends,
+    since many providers cap the number of messages per session.
+    """
+
+    def __init__(self, smtp_config, connection_timeout=30, max_messages=None):
+        self._smtp_config = smtp_config
+        self._connection_timeout = connection_timeout
+        self._max_messages = max_messages
+        self._client = None
+        self._sent = 0
+
+    def _connect(self):
+        self.close()
+        config = self._smtp_config
+        client = SMTP(
+            host=config["smtp_host"], port=config["smtp_port"], timeout=self._connection_timeout
+        )
+        if config.get("smtp_use_tls", True):
+            client.starttls()
+        client.login(user=config["smtp_username"], password=config["smtp_password"])
+        self._client = client
+        self._sent = 0
+
+    def _alive(self):
+        """Whether the open session still answers, checked before handing it a message"""
+        try:
+            return self._client.noop()[0] == 250
+        except (SMTPServerDisconnected, OSError):
+            return False
+
+    def send(self, recipient_email, message):
+        # Idle sessions get dropped by the server, so reconnect before sending
+        # rather than retrying afterwards: once the message is handed over, a
+        # dropped connection may still have delivered it, and sending it again
+        # would give the recipient a second copy. Such failures are raised.
+        if (
+            self._client is None
+            or (self._max_messages and self._sent >= self._max_messages)
+            or not self._alive()
+        ):
+            self._connect()
+        self._client.sendmail(self._smtp_config["smtp_from_email"], recipient_email, message)
+        self._sent += 1
+
+    def close(self):
+        if self._client is not None:
+            try:
+                self._client.quit()
+            except Exception:
+                pass
+            self._client = None
+
+
+class RateLimiter:
+    """Token bucket limiting how many messages per second all sessions send together"""
+
+    def __init__(self, rate, burst=None):
+        self._rate = rate
+        self._capacity = burst or max(1, rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class BulkEmailSender:
+    """Send many emails through a pool of persistent SMTP sessions
+
+    Messages are queued with ``submit`` (which blocks when the queue is full)
+    and sent by ``pool_size`` worker threads, each keeping its own
+    authenticated session open between messages. Every send is reported to
+    ``on_status(recipient_email, status, error, record)`` and, when a
+    ``status_store`` (a ProgressStore) is given, appended to it as a row with
+    ``status`` set to "sent" or "failed".
+    """
+
+    def __init__(self, config=None, pool_size=None, max_messages_per_connection=None,
+                 rate_limit=None, queue_size=None, connection_timeout=30,
+                 status_store=None, on_status=None, logger=None, metrics=None):
+        init_config = config or load_email_config()
+        missing = [key for key in REQUIRED_SETTINGS if not init_config.get(key)]
+        if missing:
+            raise ValueError(f"Invalid Email Configuration. {missing[0]} was not provided.")
+
+        self._smtp_config = {key: init_config[key] for key in REQUIRED_SETTINGS}
+        for setting, default in OPTIONAL_SETTINGS:
+            value = init_config.get(setting)
+            # smtp_use_tls=False must survive, so only missing values fall back
+            self._smtp_config[setting] = default if value is None or value == "" else value
+
+        self._pool_size = pool_size or app_config.EMAIL_POOL_SIZE
+        self._max_messages = max_messages_per_connection or app_config.EMAIL_MAX_MESSAGES_PER_CONNECTION
+        rate_limit = app_config.EMAIL_RATE_LIMIT if rate_limit is None else rate_limit
+        self._rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        # queue_size=0 means unbounded, so submit() never blocks the caller
+        self._prototype = MessagePrototype(self._smtp_config)
+        self._queue = queue.Queue(
+            maxsize=app_config.EMAIL_QUEUE_SIZE if queue_size is None else queue_size
+        )
+        self._connection_timeout = connection_timeout
+        self._status_store = status_store
+        self._on_status = on_status
+        self._metrics = metrics
+        self._logger = logger or logging.getLogger(__name__)
+        self._workers = []
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        for i in range(self._pool_size):
+            worker = threading.Thread(target=self._work, daemon=True, name=f"smtp-sender-{i}")
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def submit(self, recipient_email, subject, body, record=None):
+        """Queue one message; ``record`` is passed back with its status"""
+        if not self._workers:
+            self.start()
+        self._queue.put((recipient_email, subject, body, record or {}))
+
+    def close(self):
+        """Wait for queued messages to be sent, then close every session"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _work(self):
+        session = SMTPSession(
+            self._smtp_config, self._connection_timeout, max_messages=self._max_messages
+        )
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                recipient_email, subject, body, record = item
+                if self._rate_limiter:
+                    self._rate_limiter.acquire()
+                start = time.perf_counter()
+                try:
+                    message = self._prototype.render(recipient_email, subject, body)
+                    session.send(recipient_email, message)
+                    self._observe(start)
+                    self._report(recipient_email, "sent", None, record)
+                except Exception as e:
+                    self._logger.warning("Failed to send email to %s: %s", recipient_email, e)
+                    # Start the next message on a fresh connection
+                    session.close()
+                    self._observe(start)
+                    self._report(recipient_email, "failed", e, record)
+        finally:
+            session.close()
+
+    def _observe(self, start):
+        if self._metrics is not None:
+            self._metrics.observe("email", time.perf_counter() - start)
+
+    def _report(self, recipient_email, status, error, record):
+        with self._stats_lock:
+            if status == "sent":
+                self.sent += 1
+            else:
+                self.failed += 1
+        if self._status_store is not None:
+            try:
+                self._status_store.append(
+                    {
+                        app_config.NAME_COLUMN: record.get(app_config.NAME_COLUMN, ""),
+                        "email": recipient_email,
+                        "url": record.get("url", ""),
+                        "status": status,
+                        "error": str(error) if error else "",
+                    },
+                    [app_config.NAME_COLUMN, "email"],
+                    record.get("_csv_hash", ""),
+                )
+            except Exception as e:
+                self._logger.warning("Failed to record email status for %s: %s", recipient_email, e)
+        if self._on_status:
+            self._on_status(recipient_email, status, error, record)
@@ -0,0 +1,98 @@
+import time
+import threading
+from email_validator import validate_email, EmailNotValidError
+from email_validator.deliverability import validate_email_deliverability
+import config
+from lru_cache import LRUCache
+
+
+class EmailValidator:
+    """Validate addresses with cached results so bulk checks don't repeat DNS lookups
+
+    Syntax checks are pure string work and memoized per address. Deliverability
+    checks (MX/A record lookups) are cached per domain for ``domain_ttl``
+    seconds, so a CSV with thousands of ``@gmail.com`` rows costs one lookup.
+    """
+
+    def __init__(self, domain_ttl=None, check_deliverability=None, cache_size=None):
+        self.domain_ttl = config.EMAIL_DOMAIN_CACHE_TTL if domain_ttl is None else domain_ttl
+        self.check_deliverability = (
+            config.EMAIL_CHECK_DELIVERABILITY if check_deliverability is None else check_deliverability
+        )
+        self._syntax = LRUCache(cache_size or config.EMAIL_VALIDATION_CACHE_SIZE)
+        self._domains = {}
+        self._lock = threading.Lock()
+
+    def _check_syntax(self, email):
+        """Return ``(ascii_domain, domain, error)`` for an address, memoized"""
+        cached = self._syntax.get(email)
+        if cached is None:
+            try:
+                result = validate_email(email, check_deliverability=False)
+                cached = (result.ascii_domain, result.domain, None)
+            except EmailNotValidError as e:
+                cached = (None, None, str(e))
+            self._syntax.put(email, cached)
+        return cached
+
+    def _check_domain(self, ascii_domain, domain):
+        """Return an error message for an undeliverable domain, cached for domain_ttl"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._domains.get(ascii_domain)
+            if entry and entry[0] > now:
+                return entry[1]
+        try:
+            validate_email_deliverability(ascii_domain, domain)
+            error = None
+        except EmailNotValidError as e:
+            error = str(e)
+        with self._lock:
+            self._domains[ascii_domain] = (now + self.domain_ttl, error)
+        return error
+
+    def validate(self, email, check_deliverability=None):
+        """Return an error message for an invalid address, or None if it's valid
+
+        ``check_deliverability=False`` is the syntax-only fast mode.
+        """
+        if check_deliverability is None:
+            check_deliverability = self.check_deliverability
+        ascii_domain, domain, error = self._check_syntax((email or "").strip())
+        if error or not check_deliverability:
+            return error
+        return self._check_domain(ascii_domain, domain)
+
+    def is_valid(self, email, check_deliverability=None):
+        return self.validate(email, check_deliverability) is None
+
+    def validate_column(self, rows, column, check_deliverability=None):
+        """Check one column of every row and report the rows that fail
+
+        Returns a list of ``{"row", "name", "email", "error"}`` dicts, where
+        ``row`` is the 1-based data row number. Empty cells are not reported;
+        those rows simply have no recipient.
+        """
+        invalid = []
+        for number, row in enumerate(rows, start=1):
+            email = (row.get(column) or "").strip()
+            if not email:
+                continue
+            error = self.validate(email, check_deliverability)
+            if error:
+                invalid.append({
+                    "row": number,
+                    "name": (row.get(config.NAME_COLUMN) or "").strip(),
+                    "email": email,
+                    "error": error,
+                })
+        return invalid
+
+    def clear(self):
+        self._syntax.clear()
+        with self._lock:
+            self._domains.clear()
+
+
+# Shared by the email service, the generation pipeline and the API
+address_validator = EmailValidator()
@@ -7,12 +7,34 @@ let isComplete = false;
 let currentSettings = {};
 let settingsExpanded = true; // Start expanded by default
 let previewDebounceTimer = null;
+let previewObjectUrl = null;
+
+// Progress paging state: index of the next result row to fetch
+const PROGRESS_PAGE_SIZE = 500;
+let progressCursor = 0;
+
+// Fetch result rows recorded after the given cursor, page by page
+async function fetchProgressDelta(since) {
+    const results = [];
+    let cursor = since;
+    let data;
+
+    do {
+        const response = await fetch(`/check-progress?since=${cursor}&limit=${PROGRESS_PAGE_SIZE}`);
+        data = await response.json();
+        results.push(...data.results);
+        cursor = data.next_cursor;
+    } while (data.has_more);
+
+    return { ...data, results, next_cursor: cursor };
+}
 
 // Check for existing progress on page load
 async function checkExistingProgress() {
     try {
-        const response = await fetch('/check-progress');
-        const { has_progress, processed_count, results, has_csv, csv_matches, is_complete, is_generating } = await response.json();
+        const data = await fetchProgressDelta(0);
+        const { has_progress, processed_count, results, has_csv, csv_matches, is_complete, is_generating, job_id } = data;
+        progressCursor = data.next_cursor;
 
         if (has_progress) {
             hasProgress = true;
@@ -36,7 +58,7 @@ async function checkExistingProgress() {
                 document.getElementById('cancelBtn').classList.remove('hidden');
                 document.getElementById('resetBtn').classList.add('hidden');
 
-                startPollingForProgress(processed_count);
+                startPollingForProgress(job_id, processed_count);
             } else if (isComplete) {
                 generateBtn.classList.remove('hidden');
                 continueBtn.classList.add('hidden');
@@ -77,30 +99,46 @@ async function checkExistingProgress() {
     }
 }
 
-function startPollingForProgress(initialCount = 0) {
+function startPollingForProgress(jobId, initialCount = 0) {
     let currentCount = initialCount;
     const status = document.getElementById('status');
 
+    const onResult = (result) => {
+        if (!displayedNames.has(result.name)) {
+            currentCount++;
+            status.innerHTML = `<div class="spinner"></div>Generation in progress... ${currentCount} certificate(s) generated so far.`;
+            appendResultWithAnimation(result);
+            displayedNames.add(result.name);
+        }
+    };
+    const onDone = () => location.reload();
+
+    if (!jobId || !window.EventSource) {
+        pollProgressDelta(onResult, onDone);
+        return;
+    }
+
+    activeJobSource = followGenerationJob(jobId, {
+        onResult,
+        onDone,
+        onError: (e) => {
+            console.error('Progress stream error, falling back to polling:', e);
+            pollProgressDelta(onResult, onDone);
+        }
+    });
+}
+
+// Poll /check-progress for rows added since the last poll
+function pollProgressDelta(onResult, onDone) {
     const pollInterval = setInterval(async () => {
         try {
-            const response = await fetch('/check-progress');
-            const data = await response.json();
+            const data = await fetchProgressDelta(progressCursor);
+            progressCursor = data.next_cursor;
+            data.results.forEach(onResult);
 
             if (!data.is_generating) {
                 clearInterval(pollInterval);
-                location.reload();
-            }
-
-            if (data.results && data.results.length > 0) {
-                currentCount = data.processed_count;
-                status.innerHTML = `<div class="spinner"></div>Generation in progress... ${currentCount} certificate(s) generated so far.`;
-
-                for (const result of data.results) {
-                    if (!displayedNames.has(result.name)) {
-                        appendResultWithAnimation(result);
-                        displayedNames.add(result.name);
-                    }
-                }
+                onDone();
             }
         } catch (e) {
             console.error('Progress poll error:', e);
@@ -108,6 +146,25 @@ function startPollingForProgress(initialCount = 0) {
     }, 500);
 }
 
+// Subscribe to a generation job's Server-Sent Events stream
+function followGenerationJob(jobId, { onResult, onDone, onError }) {
+    const source = new EventSource(`/jobs/${jobId}/events`);
+
+    source.addEventListener('result', (event) => onResult(JSON.parse(event.data)));
+    source.addEventListener('done', (event) => {
+        source.close();
+        onDone(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+        // EventSource reconnects by itself unless the server refused the stream
+        if (source.readyState === EventSource.CLOSED) {
+            onError(new Error('Lost connection to generation job'));
+        }
+    };
+
+    return source;
+}
+
 // Handle file upload
 async function handleFileSelect(event) {
     const file = event.target.files[0];
@@ -171,10 +228,10 @@ async function handleFileSelect(event) {
 // Track which names we've already shown
 let displayedNames = new Set();
 
-// Track active generation controller
-let activeGenerationController = null;
+// Track the active generation job's event stream
+let activeJobSource = null;
 
-// Generate certificates with real-time progress polling
+// Generate certificates with real-time progress streaming
 async function generateCertificates() {
     if (!uploadedFile && !hasProgress) {
         alert('Please upload a CSV file first');
@@ -199,37 +256,29 @@ async function generateCertificates() {
     status.className = 'status show loading';
     status.innerHTML = '<div class="spinner"></div>Generating certificates...';
 
-    // Get current progress to avoid showing old certificates
-    const initialProgress = await fetch('/check-progress').then(r => r.json());
+    // Get rows recorded since the last fetch to avoid showing old certificates
+    const initialProgress = await fetchProgressDelta(progressCursor);
+    progressCursor = initialProgress.next_cursor;
 
     // Mark existing certificates as already displayed
-    if (initialProgress.results) {
-        initialProgress.results.forEach(r => displayedNames.add(r.name));
-    }
+    initialProgress.results.forEach(r => displayedNames.add(r.name));
 
     // Track new certificates in this session
     let newInThisSession = 0;
 
-    // Create abort controller to cancel requests on page unload
-    activeGenerationController = new AbortController();
-
-    // Start generation in background (don't wait for response)
-    const generatePromise = fetch('/generate', {
-        method: 'POST',
-        signal: activeGenerationController.signal
-    });
+    try {
+        // Start generation as a background job on the server
+        const response = await fetch('/generate', { method: 'POST' });
+        const job = await response.json();
 
-    // Poll for progress while generation is happening
-    const pollInterval = setInterval(async () => {
-        try {
-            const response = await fetch('/check-progress', {
-                signal: activeGenerationController.signal
-            });
-            const data = await response.json();
+        if (!job.success) {
+            throw new Error(job.error);
+        }
 
-            if (data.results && data.results.length > 0) {
-                // Show only new results we haven't displayed yet
-                for (const result of data.results) {
+        // Stream results as each certificate finishes
+        const data = await new Promise((resolve, reject) => {
+            activeJobSource = followGenerationJob(job.job_id, {
+                onResult: (result) => {
                     if (!displayedNames.has(result.name)) {
                         appendResultWithAnimation(result);
                         displayedNames.add(result.name);
@@ -238,42 +287,19 @@ async function generateCertificates() {
                         // Update status with count of new certificates
                         status.innerHTML = `<div class="spinner"></div>Generated ${newInThisSession} new certificate(s)...`;
                     }
-                }
-            }
-        } catch (e) {
-            if (e.name === 'AbortError') {
-                console.log('Generation aborted');
-            } else {
-                console.error('Progress poll error:', e);
-            }
-        }
-    }, 500); // Poll every 500ms
-
-    try {
-        // Wait for generation to complete
-        const response = await generatePromise;
-        const data = await response.json();
-
-        // Stop polling
-        clearInterval(pollInterval);
-
-        if (data.success) {
-            // Show any final results we might have missed
-            if (data.results && data.results.length > 0) {
-                for (const result of data.results) {
-                    if (!displayedNames.has(result.name)) {
-                        appendResultWithAnimation(result);
-                        displayedNames.add(result.name);
-                    }
-                }
-            }
+                },
+                onDone: resolve,
+                onError: reject
+            });
+        });
 
+        if (data.status !== 'failed') {
             status.className = 'status show success';
-            const previousCount = data.results.length - data.new_results.length;
+            const previousCount = data.total_count - data.new_count;
             if (previousCount > 0) {
-                status.innerHTML = `<strong>Success!</strong> Generated ${data.new_results.length} new certificate(s). Previously generated: ${previousCount}. Total: ${data.results.length}`;
+                status.innerHTML = `<strong>Success!</strong> Generated ${data.new_count} new certificate(s). Previously generated: ${previousCount}. Total: ${data.total_count}`;
             } else {
-                status.innerHTML = `<strong>Success!</strong> Generated ${data.new_results.length} certificate(s).`;
+                status.innerHTML = `<strong>Success!</strong> Generated ${data.new_count} certificate(s).`;
             }
 
             // Show download button if completed
@@ -297,7 +323,6 @@ async function generateCertificates() {
             throw new Error(data.error);
         }
     } catch (e) {
-        clearInterval(pollInterval);
         status.className = 'status show error';
         status.innerHTML = `<strong>Error:</strong> ${e.message}`;
 
@@ -313,7 +338,10 @@ async function generateCertificates() {
         cancelBtn.classList.add('hidden');
         resetBtn.classList.remove('hidden');
     } finally {
-        activeGenerationController = null;
+        if (activeJobSource) {
+            activeJobSource.close();
+            activeJobSource = null;
+        }
     }
 }
 
@@ -442,6 +470,7 @@ async function resetProgress() {
             hasProgress = false;
             isComplete = false;
             uploadedFile = false;
+            progressCursor = 0;
             displayedNames.clear();
 
             // Clear UI
@@ -527,10 +556,10 @@ window.addEventListener('DOMContentLoaded', () => {
     setupMarkerDrag();
 });
 
-// Abort active generation on page unload
+// Close the progress stream on page unload (generation keeps running on the server)
 window.addEventListener('beforeunload', () => {
-    if (activeGenerationController) {
-        activeGenerationController.abort();
+    if (activeJobSource) {
+        activeJobSource.close();
     }
 });
 
@@ -602,6 +631,9 @@ async function loadSettings() {
         document.getElementById('strokeWidthSlider').value = currentSettings.stroke_width;
         document.getElementById('strokeWidthValue').textContent = currentSettings.stroke_width;
 
+        document.getElementById('outputModeSelect').value = currentSettings.output_mode || 'raster';
+        document.getElementById('encoderPresetSelect').value = currentSettings.encoder_preset || 'default';
+
         // Convert RGB to hex for color picker
         const color = currentSettings.text_color;
         const hexColor = rgbToHex(color[0], color[1], color[2]);
@@ -694,7 +726,9 @@ function getCurrentFormSettings() {
         stroke_width: parseInt(document.getElementById('strokeWidthSlider').value),
         text_x_position: parseFloat(document.getElementById('posXValue').textContent) / 100,
         text_y_position: parseFloat(document.getElementById('posYValue').textContent) / 100,
-        image_quality: currentSettings.image_quality || 95
+        image_quality: currentSettings.image_quality || 95,
+        output_mode: document.getElementById('outputModeSelect').value,
+        encoder_preset: document.getElementById('encoderPresetSelect').value
     };
 }
 
@@ -734,22 +768,23 @@ async function updatePreview() {
         const settings = getCurrentFormSettings();
         console.log('Updating preview with settings:', settings);
 
-        const response = await fetch('/api/preview', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ name: 'Sample Name', ...settings })
-        });
-
-        const data = await response.json();
+        // Raw image bytes; the browser revalidates with the ETag, so unchanged settings cost a 304
+        const params = new URLSearchParams({ name: 'Sample Name', settings: JSON.stringify(settings) });
+        const response = await fetch(`/api/preview/image?${params}`);
 
-        if (data.success) {
-            // Force image refresh by adding timestamp to prevent caching
-            previewImage.src = data.preview;
+        if (response.ok) {
+            const blob = await response.blob();
+            if (previewObjectUrl) {
+                URL.revokeObjectURL(previewObjectUrl);
+            }
+            previewObjectUrl = URL.createObjectURL(blob);
+            previewImage.src = previewObjectUrl;
             previewImage.style.opacity = '1';
 
             // Update position marker
             updatePositionMarker();
         } else {
+            const data = await response.json();
             console.error('Preview generation failed:', data.error);
             // Show a placeholder or error state
             previewImage.alt = 'Preview failed: ' + data.error;
@@ -0,0 +1,78 @@
+"""Render-once text tiles that are composited onto certificate templates"""
+
+from PIL import Image, ImageDraw
+from lru_cache import LRUCache
+import config
+
+
+class TextTile:
+    """Coverage mask for one rendered string plus the metrics used to place it"""
+
+    def __init__(self, mask, text_width, text_height, ink_offset):
+        self.mask = mask
+        self.text_width = text_width
+        self.text_height = text_height
+        # Where the mask's top-left sits relative to the draw.text() origin
+        self.ink_offset = ink_offset
+
+
+def text_origin(position, size, text_width, text_height, anchor="center"):
+    """Top-left draw origin for a text box placed at ``position`` (fractions of ``size``)
+
+    The box is centred vertically; ``anchor`` (left, center or right) says
+    which of its edges, or its middle, sits on the horizontal position.
+    """
+    x = int(size[0] * position[0])
+    if anchor == "center":
+        x -= text_width // 2
+    elif anchor == "right":
+        x -= text_width
+    return x, int(size[1] * position[1]) - text_height // 2
+
+
+def render_text_tile(text, font, stroke_width=0):
+    """Measure and rasterize ``text`` once into an "L" coverage mask"""
+    probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+    bbox = probe.textbbox((0, 0), text, font=font)
+    ink_bbox = probe.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+
+    size = (max(1, ink_bbox[2] - ink_bbox[0]), max(1, ink_bbox[3] - ink_bbox[1]))
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).text(
+        (-ink_bbox[0], -ink_bbox[1]), text, fill=255, font=font,
+        stroke_width=stroke_width, stroke_fill=255
+    )
+    return TextTile(mask, bbox[2] - bbox[0], bbox[3] - bbox[1], (ink_bbox[0], ink_bbox[1]))
+
+
+class TextLayer:
+    """Memoize text tiles so repeated names are rasterized only once
+
+    Tiles are keyed by (text, font, stroke width). The font object itself is
+    part of the key, and fonts come from the asset cache keyed by file
+    revision, so a replaced font file never reuses stale tiles. Colour is
+    applied at composite time, so one tile serves every text colour.
+    """
+
+    def __init__(self, maxsize=None):
+        self._tiles = LRUCache(maxsize or config.TEXT_TILE_CACHE_SIZE)
+
+    def get_tile(self, text, font, stroke_width=0):
+        key = (text, font, stroke_width)
+        tile = self._tiles.get(key)
+        if tile is None:
+            tile = render_text_tile(text, font, stroke_width)
+            self._tiles.put(key, tile)
+        return tile
+
+    def draw(self, img, text, font, position, color, stroke_width=0, anchor="center"):
+        """Composite ``text`` at ``position`` (fractions of the image size), see text_origin"""
+        tile = self.get_tile(text, font, stroke_width)
+        x, y = text_origin(position, img.size, tile.text_width, tile.text_height, anchor)
+        box = (x + tile.ink_offset[0], y + tile.ink_offset[1])
+        img.paste(tuple(color), box, mask=tile.mask)
+        return img
+
+
+# Shared by every CertificateGenerator in this process
+text_layer = TextLayer()
@@ -0,0 +1,129 @@
+"""Concurrent upload stage that runs alongside certificate rendering"""
+
+import time
+import queue
+import threading
+import config
+
+# Marks the end of the job stream for an upload worker
+_DONE = object()
+
+
+class UploadPipeline:
+    """Drain rendered PDFs through a pool of upload threads
+
+    Rendered jobs are pushed onto a bounded queue by a feeder thread. At most
+    ``queue_size + workers`` jobs are in flight between being pulled from the
+    renderer and being yielded, counting finished uploads that wait behind a
+    slower one for their turn. Once that window is full the feeder stops
+    pulling (and therefore rendering) new certificates until the caller has
+    taken the oldest result. Any object with an ``upload(pdf, name)`` method
+    that takes a path or PDF bytes can be used as the uploader, e.g.
+    ``PDFUploader`` or ``LocalFileStore``.
+    """
+
+    def __init__(self, uploader, workers=None, queue_size=None, metrics=None):
+        self.uploader = uploader
+        self.metrics = metrics
+        self.workers = max(1, workers or config.UPLOAD_WORKERS)
+        self.queue_size = queue_size or config.UPLOAD_QUEUE_SIZE or self.workers * 2
+
+    def run(self, jobs):
+        """Upload every job and yield ``(index, url, error)`` in index order
+
+        ``jobs`` yields ``(index, name, pdf, error)`` tuples with
+        contiguous indices starting at 0, as produced by ``BatchGenerator.render``.
+        Jobs that already carry a render error are passed through without uploading.
+        """
+        jobs_queue = queue.Queue(maxsize=self.queue_size)
+        results = {}
+        results_ready = threading.Condition()
+        stop = threading.Event()
+        # Released as each result is yielded, so a slow upload at the head of
+        # the line can't let out-of-order results pile up in ``results``
+        window = threading.Semaphore(self.queue_size + self.workers)
+        state = {"submitted": 0, "feeding": True, "error": None}
+
+        def reserve():
+            while not stop.is_set():
+                if window.acquire(timeout=0.1):
+                    return True
+            return False
+
+        def put(item):
+            # Poll so an abandoned run can't leave the feeder blocked forever
+            while not stop.is_set():
+                try:
+                    jobs_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def feed():
+            try:
+                jobs_iter = iter(jobs)
+                while reserve():
+                    job = next(jobs_iter, None)
+                    if job is None or not put(job):
+                        break
+                    with results_ready:
+                        state["submitted"] += 1
+            except Exception as e:
+                state["error"] = e
+            finally:
+                for _ in range(self.workers):
+                    put(_DONE)
+                with results_ready:
+                    state["feeding"] = False
+                    results_ready.notify_all()
+
+        def upload():
+            while not stop.is_set():
+                job = jobs_queue.get()
+                if job is _DONE:
+                    return
+                index, name, pdf, error = job
+                url = None
+                if error is None:
+                    start = time.perf_counter()
+                    try:
+                        url = self.uploader.upload(pdf, name)
+                    except Exception as e:
+                        error = e
+                    if self.metrics is not None:
+                        self.metrics.observe("upload", time.perf_counter() - start)
+                with results_ready:
+                    results[index] = (url, error)
+                    results_ready.notify_all()
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        threads += [threading.Thread(target=upload, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        next_index = 0
+        try:
+            while True:
+                with results_ready:
+                    while next_index not in results and (
+                        state["feeding"] or next_index < state["submitted"]
+                    ):
+                        results_ready.wait()
+                    if next_index not in results:
+                        break
+                    url, error = results.pop(next_index)
+                yield next_index, url, error
+                window.release()
+                next_index += 1
+
+            if state["error"]:
+                raise state["error"]
+        finally:
+            stop.set()
+            # Unblock workers still waiting on an empty queue
+            for _ in range(self.workers):
+                try:
+                    jobs_queue.put_nowait(_DONE)
+                except queue.Full:
+                    break